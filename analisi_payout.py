@@ -0,0 +1,249 @@
+import numpy as np
+import pandas as pd
+
+from motore_quote import (ETICHETTE_GOAL_NOGOAL, ETICHETTE_RISULTATO, ETICHETTE_UNDER_OVER, codici_esiti,
+                          etichette_risultati_esatti, griglie_da_dizionari)
+from regolamento_scommesse import COLONNE_QUOTE
+
+# Limiti delle fasce di quota usate per la calibrazione
+FASCE_QUOTE = (1.0, 1.25, 1.5, 2.0, 2.5, 3.0, 4.0, 6.0, 10.0, 20.0, 50.0)
+
+# Esito di codici_esiti di ogni mercato a esito singolo analizzato
+ESITI_MERCATI = {
+    '1x2': 'risultato',
+    'under_over': 'under_over',
+    'goal_nogoal': 'goal_nogoal',
+}
+
+# Colonne delle quote e selezioni dei mercati a esito singolo, nell'ordine dei codici degli esiti
+MERCATI_COLONNE = {
+    '1x2': (COLONNE_QUOTE['risultato'], tuple(ETICHETTE_RISULTATO)),
+    'under_over': (COLONNE_QUOTE['under_over'], tuple(ETICHETTE_UNDER_OVER)),
+    'goal_nogoal': (COLONNE_QUOTE['goal_nogoal'], tuple(ETICHETTE_GOAL_NOGOAL)),
+}
+
+
+def selezioni_vincenti(gol_casa, gol_trasferta, max_gol=6):
+    """
+    Indice della selezione vincente di ogni partita per ogni mercato, nello stesso ordine delle
+    colonne delle quote: sono i codici di codici_esiti
+
+    :param gol_casa: array con i gol della squadra di casa
+    :param gol_trasferta: array con i gol della squadra in trasferta
+    :param max_gol: dimensione della griglia del risultato esatto meno uno
+    :return: dizionario {mercato: array di indici} per i mercati di MERCATI_COLONNE e 'risultato_esatto'
+             (-1 se nessuna selezione del mercato è vincente)
+    """
+    # Limite per squadra: ogni casella della griglia è una selezione (NaN se non offerta) e solo i
+    # risultati fuori griglia finiscono nel codice "Altro", che non ha una quota
+    codici = codici_esiti(np.asarray(gol_casa, dtype=np.int64), np.asarray(gol_trasferta, dtype=np.int64),
+                          max_gol, limite_per_squadra=True)
+    vincenti = {mercato: codici[esito].astype(np.int64) for mercato, esito in ESITI_MERCATI.items()}
+    dimensione = max_gol + 1
+    risultato_esatto = codici['risultato_esatto'].astype(np.int64)
+    vincenti['risultato_esatto'] = np.where(risultato_esatto < dimensione * dimensione, risultato_esatto, -1)
+    return vincenti
+
+
+class _StatisticheMercato:
+    def __init__(self, selezioni, fasce):
+        self.selezioni = list(selezioni)
+        self.fasce = np.asarray(fasce, dtype=float)
+        num_selezioni = len(self.selezioni)
+        num_fasce = len(self.fasce) + 1
+
+        self.eventi = 0
+        self.somma_overround = 0.0
+        self.somma_payout_teorico = 0.0
+        # Una puntata unitaria su ogni selezione offerta
+        self.puntate = np.zeros(num_selezioni, dtype=np.int64)
+        self.vinte = np.zeros(num_selezioni, dtype=np.int64)
+        self.pagato = np.zeros(num_selezioni)
+        self.puntate_fascia = np.zeros(num_fasce, dtype=np.int64)
+        self.vinte_fascia = np.zeros(num_fasce, dtype=np.int64)
+        self.pagato_fascia = np.zeros(num_fasce)
+        self.probabilita_implicita_fascia = np.zeros(num_fasce)
+
+    def aggiorna(self, quote, vincenti):
+        quote = np.asarray(quote, dtype=float)
+        offerte = ~np.isnan(quote)
+        con_quote = offerte.any(axis=1)
+        quote, offerte, vincenti = quote[con_quote], offerte[con_quote], vincenti[con_quote]
+        if len(quote) == 0:
+            return
+
+        # Margine teorico di ogni evento dalla somma delle probabilità implicite
+        somma_inversi = np.where(offerte, 1 / np.where(offerte, quote, 1), 0).sum(axis=1)
+        self.eventi += len(quote)
+        self.somma_overround += float((somma_inversi - 1).sum())
+        self.somma_payout_teorico += float((1 / somma_inversi).sum())
+
+        # Matrice delle selezioni vinte (solo quelle effettivamente offerte)
+        vinte = np.zeros(quote.shape, dtype=bool)
+        righe = np.flatnonzero(vincenti >= 0)
+        vinte[righe, vincenti[righe]] = True
+        vinte &= offerte
+
+        self.puntate += offerte.sum(axis=0)
+        self.vinte += vinte.sum(axis=0)
+        self.pagato += np.where(vinte, quote, 0).sum(axis=0)
+
+        quote_offerte = quote[offerte]
+        fasce = np.digitize(quote_offerte, self.fasce)
+        lunghezza = len(self.puntate_fascia)
+        self.puntate_fascia += np.bincount(fasce, minlength=lunghezza)
+        self.vinte_fascia += np.bincount(fasce, weights=vinte[offerte], minlength=lunghezza).astype(np.int64)
+        self.pagato_fascia += np.bincount(fasce, weights=quote_offerte * vinte[offerte], minlength=lunghezza)
+        self.probabilita_implicita_fascia += np.bincount(fasce, weights=1 / quote_offerte, minlength=lunghezza)
+
+
+class AnalisiPayout:
+    def __init__(self, margine_operatore=None, max_gol=6, fasce_quote=FASCE_QUOTE):
+        """
+        Analisi in streaming di payout e margini per mercato su uno storico di quote e risultati.
+
+        I blocchi vengono letti uno alla volta e accumulati in contatori di dimensione fissa,
+        quindi la memoria non dipende dalla lunghezza dello storico. Ogni selezione offerta conta
+        come una puntata unitaria.
+
+        :param margine_operatore: margine configurato sul generatore, con cui confrontare quello realizzato
+        :param max_gol: NUM_AZIONI_MAX del generatore (dimensione della griglia del risultato esatto)
+        :param fasce_quote: limiti delle fasce di quota per la calibrazione
+        """
+        self.margine_operatore = margine_operatore
+        self.max_gol = max_gol
+        self._mercati = {
+            mercato: _StatisticheMercato(selezioni, fasce_quote)
+            for mercato, (_, selezioni) in MERCATI_COLONNE.items()
+        }
+        dimensione = max_gol + 1
+        self._mercati['risultato_esatto'] = _StatisticheMercato(
+            etichette_risultati_esatti(max_gol)[:dimensione * dimensione], fasce_quote)
+
+    def aggiorna_colonne(self, gol_casa, gol_trasferta, quote, griglie_risultato_esatto=None):
+        """
+        Accumula un blocco di partite fornito come colonne NumPy
+
+        :param gol_casa: array con i gol della squadra di casa
+        :param gol_trasferta: array con i gol della squadra in trasferta
+        :param quote: dizionario {colonna: array} con le quote dei mercati in MERCATI_COLONNE
+                      (i mercati senza colonne vengono saltati)
+        :param griglie_risultato_esatto: array (n, max_gol+1, max_gol+1) o (n, (max_gol+1)^2) con
+                                         le quote del risultato esatto, NaN se non offerte
+        """
+        vincenti = selezioni_vincenti(gol_casa, gol_trasferta, self.max_gol)
+        for mercato, (colonne, _) in MERCATI_COLONNE.items():
+            if not all(c in quote for c in colonne):
+                continue
+            matrice = np.column_stack([np.asarray(quote[c], dtype=float) for c in colonne])
+            self._mercati[mercato].aggiorna(matrice, vincenti[mercato])
+
+        if griglie_risultato_esatto is not None:
+            griglie = np.asarray(griglie_risultato_esatto, dtype=float).reshape(len(gol_casa), -1)
+            self._mercati['risultato_esatto'].aggiorna(griglie, vincenti['risultato_esatto'])
+
+    def aggiorna(self, blocco):
+        """
+        Accumula un blocco di partite in formato DataFrame (es. output di simula_giornata_completa)
+
+        :param blocco: DataFrame con gol_casa, gol_trasferta, le colonne delle quote e
+                       facoltativamente quote_risultati_esatti
+        """
+        griglie = None
+        if 'quote_risultati_esatti' in blocco:
+            griglie = griglie_da_dizionari(blocco['quote_risultati_esatti'].tolist(), self.max_gol)
+        quote = {c: blocco[c].to_numpy() for c in blocco.columns if c.startswith('quota_')}
+        self.aggiorna_colonne(blocco['gol_casa'].to_numpy(), blocco['gol_trasferta'].to_numpy(), quote, griglie)
+
+    def aggiorna_da_archivio(self, archivio, inizio=None, fine=None, dimensione_blocco=1_000_000):
+        """
+        Scorre un ArchivioPartite a blocchi, leggendo solo le colonne necessarie
+
+        :param archivio: ArchivioPartite
+        :param inizio: inizio dell'intervallo di tempo (incluso)
+        :param fine: fine dell'intervallo di tempo (escluso)
+        :param dimensione_blocco: partite lette per blocco
+        """
+        righe = archivio.righe_intervallo(inizio, fine)
+        colonne_quote = [c for colonne, _ in MERCATI_COLONNE.values() for c in colonne]
+        for primo in range(righe.start, righe.stop, dimensione_blocco):
+            blocco = slice(primo, min(primo + dimensione_blocco, righe.stop))
+            self.aggiorna_colonne(archivio['gol_casa'][blocco], archivio['gol_trasferta'][blocco],
+                                  {c: archivio[c][blocco] for c in colonne_quote},
+                                  archivio['quote_risultato_esatto'][blocco])
+
+    def riepilogo(self):
+        """
+        :return: DataFrame con una riga per mercato: eventi, puntate, payout realizzato e teorico,
+                 margine teorico medio e scostamento dal margine dell'operatore
+        """
+        righe = []
+        for mercato, statistiche in self._mercati.items():
+            if statistiche.eventi == 0:
+                continue
+            puntate = statistiche.puntate.sum()
+            margine_teorico = statistiche.somma_overround / statistiche.eventi
+            righe.append({
+                'mercato': mercato,
+                'eventi': statistiche.eventi,
+                'puntate': int(puntate),
+                'payout_realizzato': statistiche.pagato.sum() / puntate,
+                'payout_teorico': statistiche.somma_payout_teorico / statistiche.eventi,
+                'margine_teorico': margine_teorico,
+                'scostamento_margine': (margine_teorico - self.margine_operatore
+                                        if self.margine_operatore is not None else np.nan),
+            })
+        return pd.DataFrame(righe)
+
+    def per_selezione(self, mercato):
+        """
+        :param mercato: nome del mercato
+        :return: DataFrame con puntate, frequenza di vittoria e payout per selezione
+        """
+        statistiche = self._mercati[mercato]
+        offerte = statistiche.puntate > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return pd.DataFrame({
+                'selezione': statistiche.selezioni,
+                'puntate': statistiche.puntate,
+                'frequenza_vittoria': statistiche.vinte / statistiche.puntate,
+                'payout': statistiche.pagato / statistiche.puntate,
+            })[offerte].reset_index(drop=True)
+
+    def calibrazione(self, mercato):
+        """
+        Confronta per fascia di quota la probabilità implicita media con la frequenza di vittoria osservata
+
+        :param mercato: nome del mercato
+        :return: DataFrame con una riga per fascia con almeno una puntata
+        """
+        statistiche = self._mercati[mercato]
+        limiti = np.concatenate([[0.0], statistiche.fasce, [np.inf]])
+        puntate = statistiche.puntate_fascia
+        usate = puntate > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return pd.DataFrame({
+                'quota_min': limiti[:-1],
+                'quota_max': limiti[1:],
+                'puntate': puntate,
+                'probabilita_implicita': statistiche.probabilita_implicita_fascia / puntate,
+                'frequenza_vittoria': statistiche.vinte_fascia / puntate,
+                'payout': statistiche.pagato_fascia / puntate,
+            })[usate].reset_index(drop=True)
+
+
+# Esempio d'uso
+if __name__ == "__main__":
+    from cloude_virtual import GeneratoreQuoteCalcioVirtuale
+
+    generatore = GeneratoreQuoteCalcioVirtuale(margine_operatore=0.10, seed=7)
+    analisi = AnalisiPayout(generatore.margine_operatore, max_gol=generatore.NUM_AZIONI_MAX)
+    for calendario in generatore.genera_calendario_continuo(partite_per_blocco=1000, num_blocchi=20):
+        analisi.aggiorna(generatore.simula_giornata_completa(calendario))
+
+    print("RIEPILOGO PER MERCATO:")
+    print(analisi.riepilogo().to_string(index=False, float_format='%.4f'))
+    print("\nCALIBRAZIONE 1X2:")
+    print(analisi.calibrazione('1x2').to_string(index=False, float_format='%.3f'))
+    print("\nSELEZIONI UNDER/OVER:")
+    print(analisi.per_selezione('under_over').to_string(index=False, float_format='%.3f'))
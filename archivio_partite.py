@@ -0,0 +1,288 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+from motore_quote import codici_esiti, griglie_da_dizionari
+from storico_risultati import COLONNE as COLONNE_RISULTATI, etichette_esiti
+
+# Quote offerte memorizzate per ogni partita (NaN se il modello non quota il mercato)
+COLONNE_QUOTE = {
+    'quota_1': np.float32,
+    'quota_X': np.float32,
+    'quota_2': np.float32,
+    'quota_under': np.float32,
+    'quota_over': np.float32,
+    'quota_goal': np.float32,
+    'quota_nogoal': np.float32,
+}
+
+VERSIONE_FORMATO = 1
+FILE_METADATI = 'archivio.json'
+
+
+class ArchivioPartite:
+    def __init__(self, percorso, scrittura=False):
+        """
+        Apre un archivio su disco di calendari, quote offerte e risultati simulati.
+
+        Ogni colonna è un file binario grezzo letto con np.memmap, quindi le letture caricano
+        solo le pagine effettivamente usate. Le righe sono in ordine di data_ora, e le ricerche per
+        intervallo di tempo sono ricerche binarie. Il numero di righe valide è scritto in
+        archivio.json solo dopo i dati, quindi una scrittura interrotta non rende visibili righe parziali.
+
+        In lettura i file non vengono mai modificati: un lettore può aprire l'archivio mentre un altro
+        processo sta accodando una giornata e vede solo le righe registrate in archivio.json.
+        Un solo processo alla volta può aprirlo in scrittura.
+
+        :param percorso: cartella dell'archivio, creata con ArchivioPartite.crea
+        :param scrittura: True per poter accodare giornate; all'apertura vengono eliminati i dati
+                          di una scrittura interrotta
+        """
+        self.percorso = percorso
+        self.scrittura = scrittura
+        with open(os.path.join(percorso, FILE_METADATI)) as f:
+            self._metadati = json.load(f)
+        if self._metadati['versione'] != VERSIONE_FORMATO:
+            raise ValueError(f"Versione dell'archivio non supportata: {self._metadati['versione']}")
+
+        self.max_gol = self._metadati['max_gol']
+        self.nomi_squadre = np.array(self._metadati['nomi_squadre'], dtype=object)
+        dimensione = self.max_gol + 1
+        self._colonne = {**COLONNE_RISULTATI, **COLONNE_QUOTE}
+        # Griglia delle quote del risultato esatto, una riga di (max_gol+1)^2 valori per partita
+        self._forme = {'quote_risultato_esatto': (dimensione * dimensione,)}
+        self._colonne['quote_risultato_esatto'] = np.float32
+        self._viste = {}
+
+        if not scrittura:
+            return
+        # Elimina eventuali dati scritti oltre l'ultima giornata registrata (scrittura interrotta),
+        # altrimenti le giornate accodate finirebbero disallineate
+        for nome in self._colonne:
+            dimensione_attesa = len(self) * self._byte_per_riga(nome)
+            if os.path.getsize(self._file(nome)) > dimensione_attesa:
+                os.truncate(self._file(nome), dimensione_attesa)
+
+    @classmethod
+    def crea(cls, percorso, nomi_squadre, max_gol=6, limite_per_squadra=False):
+        """
+        Crea un archivio vuoto
+
+        :param percorso: cartella da creare
+        :param nomi_squadre: nomi delle squadre nell'ordine degli id
+        :param max_gol: numero massimo di gol quotato nel risultato esatto (NUM_AZIONI_MAX del generatore)
+        :param limite_per_squadra: come in esiti_partite (True per cloude_virtual, False per cloude_v3)
+        :return: ArchivioPartite aperto in scrittura
+        """
+        os.makedirs(percorso)
+        for nome in [*COLONNE_RISULTATI, *COLONNE_QUOTE, 'quote_risultato_esatto']:
+            open(os.path.join(percorso, f"{nome}.bin"), 'wb').close()
+        cls._scrivi_metadati(percorso, {
+            'versione': VERSIONE_FORMATO,
+            'lunghezza': 0,
+            'max_gol': max_gol,
+            'limite_per_squadra': limite_per_squadra,
+            'nomi_squadre': list(nomi_squadre),
+        })
+        return cls(percorso, scrittura=True)
+
+    @classmethod
+    def per_generatore(cls, percorso, generatore):
+        """
+        Apre in scrittura l'archivio se esiste, altrimenti lo crea con squadre e mercati del generatore
+
+        :param percorso: cartella dell'archivio
+        :param generatore: GeneratoreQuoteCalcioVirtuale (cloude_v3 o cloude_virtual)
+        :return: ArchivioPartite aperto in scrittura
+        """
+        if os.path.exists(os.path.join(percorso, FILE_METADATI)):
+            return cls(percorso, scrittura=True)
+        return cls.crea(percorso, generatore.squadre.nomi, generatore.NUM_AZIONI_MAX,
+                        generatore.LIMITE_GOL_PER_SQUADRA)
+
+    @staticmethod
+    def _scrivi_metadati(percorso, metadati):
+        temporaneo = os.path.join(percorso, FILE_METADATI + '.tmp')
+        with open(temporaneo, 'w') as f:
+            json.dump(metadati, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporaneo, os.path.join(percorso, FILE_METADATI))
+
+    def _file(self, nome):
+        return os.path.join(self.percorso, f"{nome}.bin")
+
+    def _byte_per_riga(self, nome):
+        return np.dtype(self._colonne[nome]).itemsize * int(np.prod(self._forme.get(nome, ())))
+
+    def __len__(self):
+        return self._metadati['lunghezza']
+
+    @property
+    def colonne(self):
+        return list(self._colonne)
+
+    def aggiungi_giornata(self, risultati):
+        """
+        Accoda una giornata: calendario, quote offerte e risultati
+
+        :param risultati: DataFrame prodotto da simula_giornata_completa
+        :return: slice delle righe aggiunte
+        """
+        if not self.scrittura:
+            raise ValueError("Archivio aperto in sola lettura: usare ArchivioPartite(percorso, scrittura=True)")
+        num_partite = len(risultati)
+        data_ora = risultati['data_ora'].to_numpy().astype('datetime64[s]')
+        if len(self) and num_partite and data_ora[0] < self['data_ora'][-1]:
+            raise ValueError("Le giornate vanno aggiunte in ordine di data_ora")
+        if num_partite and np.any(np.diff(data_ora) < np.timedelta64(0)):
+            raise ValueError("Le partite della giornata devono essere in ordine di data_ora")
+
+        gol_casa = risultati['gol_casa'].to_numpy()
+        gol_trasferta = risultati['gol_trasferta'].to_numpy()
+        valori = {
+            'id': risultati['id'].to_numpy(),
+            'data_ora': data_ora,
+            'id_casa': risultati['id_casa'].to_numpy(),
+            'id_trasferta': risultati['id_trasferta'].to_numpy(),
+            'gol_casa': gol_casa,
+            'gol_trasferta': gol_trasferta,
+            **codici_esiti(gol_casa, gol_trasferta, self.max_gol, self._metadati['limite_per_squadra']),
+            **{nome: risultati[nome].to_numpy() if nome in risultati else np.full(num_partite, np.nan)
+               for nome in COLONNE_QUOTE},
+            'quote_risultato_esatto': griglie_da_dizionari(risultati['quote_risultati_esatti'].tolist(), self.max_gol),
+        }
+
+        # Prima i dati, poi il numero di righe: chi legge vede solo giornate complete
+        for nome, valore in valori.items():
+            with open(self._file(nome), 'ab') as f:
+                f.write(np.ascontiguousarray(valore, dtype=self._colonne[nome]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        inizio = len(self)
+        self._metadati['lunghezza'] = inizio + num_partite
+        self._scrivi_metadati(self.percorso, self._metadati)
+        self._viste.clear()
+        return slice(inizio, inizio + num_partite)
+
+    def aggiorna(self):
+        """
+        Rilegge il numero di righe, per vedere le giornate aggiunte da un altro processo
+        (le colonne restano mappate solo fino all'ultima giornata registrata)
+        """
+        with open(os.path.join(self.percorso, FILE_METADATI)) as f:
+            self._metadati = json.load(f)
+        self._viste.clear()
+
+    def __getitem__(self, colonna):
+        """
+        Restituisce una colonna mappata in memoria, in sola lettura
+
+        :param colonna: nome della colonna
+        :return: np.memmap di len(self) righe (array vuoto se l'archivio è vuoto)
+        """
+        if colonna not in self._viste:
+            forma = (len(self), *self._forme.get(colonna, ()))
+            if len(self) == 0:
+                self._viste[colonna] = np.empty(forma, dtype=self._colonne[colonna])
+            else:
+                self._viste[colonna] = np.memmap(self._file(colonna), dtype=self._colonne[colonna],
+                                                 mode='r', shape=forma)
+        return self._viste[colonna]
+
+    def righe_intervallo(self, inizio=None, fine=None):
+        """
+        Trova le righe con inizio <= data_ora < fine con una ricerca binaria
+
+        :param inizio: datetime o np.datetime64 (default: dalla prima partita)
+        :param fine: datetime o np.datetime64, escluso (default: fino all'ultima partita)
+        :return: slice delle righe
+        """
+        data_ora = self['data_ora']
+        primo = 0 if inizio is None else int(np.searchsorted(data_ora, np.datetime64(inizio, 's'), 'left'))
+        ultimo = len(self) if fine is None else int(np.searchsorted(data_ora, np.datetime64(fine, 's'), 'left'))
+        return slice(primo, max(primo, ultimo))
+
+    def _id_squadra(self, squadra):
+        if isinstance(squadra, str):
+            trovate = np.flatnonzero(self.nomi_squadre == squadra)
+            if len(trovate) == 0:
+                raise ValueError(f"Squadra sconosciuta: '{squadra}'")
+            return int(trovate[0])
+        return int(squadra)
+
+    def indici(self, inizio=None, fine=None, squadra=None):
+        """
+        Seleziona le partite di un intervallo di tempo, eventualmente solo quelle di una squadra
+
+        :param inizio: inizio dell'intervallo (incluso)
+        :param fine: fine dell'intervallo (escluso)
+        :param squadra: id o nome della squadra, in casa o in trasferta
+        :return: slice (senza squadra) o array di indici di riga
+        """
+        righe = self.righe_intervallo(inizio, fine)
+        if squadra is None:
+            return righe
+        id_squadra = self._id_squadra(squadra)
+        # Si leggono solo le colonne delle squadre nell'intervallo richiesto
+        coinvolta = (self['id_casa'][righe] == id_squadra) | (self['id_trasferta'][righe] == id_squadra)
+        return righe.start + np.flatnonzero(coinvolta)
+
+    def leggi(self, inizio=None, fine=None, squadra=None, colonne=None):
+        """
+        Legge le partite selezionate in un DataFrame, con nomi delle squadre ed esiti come Categorical
+
+        :param inizio: inizio dell'intervallo (incluso)
+        :param fine: fine dell'intervallo (escluso)
+        :param squadra: id o nome della squadra, in casa o in trasferta
+        :param colonne: colonne da leggere (default: tutte tranne la griglia del risultato esatto)
+        :return: DataFrame
+        """
+        righe = self.indici(inizio, fine, squadra)
+        colonne = colonne or [c for c in self._colonne if c != 'quote_risultato_esatto']
+        dati = {}
+        for nome in colonne:
+            valori = np.asarray(self[nome][righe])
+            dati[nome] = list(valori) if valori.ndim > 1 else valori
+
+        etichette = etichette_esiti(self.max_gol)
+        for nome in set(dati) & set(etichette):
+            dati[nome] = pd.Categorical.from_codes(dati[nome], categories=list(etichette[nome]))
+        risultato = pd.DataFrame(dati)
+        if 'id_casa' in risultato:
+            risultato.insert(risultato.columns.get_loc('id_casa'), 'squadra_casa', self.nomi_squadre[risultato['id_casa']])
+        if 'id_trasferta' in risultato:
+            risultato.insert(risultato.columns.get_loc('id_trasferta'), 'squadra_trasferta',
+                             self.nomi_squadre[risultato['id_trasferta']])
+        return risultato
+
+    def griglie_risultato_esatto(self, righe):
+        """
+        :param righe: slice o array di indici di riga
+        :return: array (n, max_gol+1, max_gol+1) con le quote del risultato esatto offerte
+        """
+        dimensione = self.max_gol + 1
+        return np.asarray(self['quote_risultato_esatto'][righe]).reshape(-1, dimensione, dimensione)
+
+
+# Esempio d'uso
+if __name__ == "__main__":
+    import tempfile
+    from datetime import datetime, timedelta
+    from cloude_virtual import GeneratoreQuoteCalcioVirtuale
+
+    generatore = GeneratoreQuoteCalcioVirtuale(margine_operatore=0.10, seed=1)
+    with tempfile.TemporaryDirectory() as cartella:
+        archivio = ArchivioPartite.per_generatore(os.path.join(cartella, 'archivio'), generatore)
+        inizio = datetime(2025, 1, 1)
+        for calendario in generatore.genera_calendario_continuo(ora_inizio=inizio, num_blocchi=200):
+            archivio.aggiungi_giornata(generatore.simula_giornata_completa(calendario))
+
+        print(f"{len(archivio)} partite archiviate")
+        squadra = generatore.squadre.nomi[0]
+        partite = archivio.leggi(inizio + timedelta(hours=2), inizio + timedelta(hours=4), squadra=squadra)
+        print(f"Partite di {squadra} tra le 02:00 e le 04:00:")
+        print(partite[['id', 'data_ora', 'squadra_casa', 'squadra_trasferta', 'quota_1', 'quota_X', 'quota_2',
+                       'gol_casa', 'gol_trasferta', 'risultato']].to_string(index=False))
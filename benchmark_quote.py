@@ -0,0 +1,199 @@
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import cloude_v3
+import cloude_virtual
+import main
+
+# Numero di partite (o simulazioni) per ogni misura
+SCALE = (1, 100, 10_000, 1_000_000)
+
+# I metodi che quotano una partita alla volta vengono misurati solo fino a questa scala
+LIMITE_SCALARE = 10_000
+
+# Tempo minimo di misura per ogni caso e limiti sul numero di ripetizioni
+TEMPO_MINIMO = 0.5
+RIPETIZIONI_MIN = 3
+RIPETIZIONI_MAX = 50
+
+MODELLI = {
+    'cloude_v3': cloude_v3,
+    'cloude_virtual': cloude_virtual,
+}
+
+
+def _coppie_casuali(num_squadre, n, rng):
+    ids_casa = rng.integers(0, num_squadre, n)
+    ids_trasferta = (ids_casa + rng.integers(1, num_squadre, n)) % num_squadre
+    return ids_casa, ids_trasferta
+
+
+def _casi_modello(generatore, n, rng):
+    """
+    Prepara i casi da misurare per un modello di squadre alla scala n
+
+    :return: lista di tuple (metodo, funzione senza argomenti, scalare, mercati), dove mercati sono
+             quelli quotati dal metodo (basta che il modello ne quoti uno; vuoto = nessun mercato)
+    """
+    ids_casa, ids_trasferta = _coppie_casuali(len(generatore.squadre), n, rng)
+    coppie = list(zip(ids_casa.tolist(), ids_trasferta.tolist()))
+
+    # Calendario ridotto alle colonne usate dalla simulazione, per non misurare la quotazione
+    calendario = pd.DataFrame({'id': np.arange(1, n + 1), 'id_casa': ids_casa, 'id_trasferta': ids_trasferta})
+
+    return [
+        ('calcola_probabilita_risultati',
+         lambda: [generatore.calcola_probabilita_risultati(c, t) for c, t in coppie], True, ('1x2',)),
+        ('calcola_probabilita_risultati_batch',
+         lambda: generatore.calcola_probabilita_risultati_batch(ids_casa, ids_trasferta), False, ('1x2',)),
+        ('calcola_quote_under_over',
+         lambda: [generatore.calcola_quote_under_over(c, t) for c, t in coppie], True, ('under_over',)),
+        ('calcola_quote_goal_nogoal',
+         lambda: [generatore.calcola_quote_goal_nogoal(c, t) for c, t in coppie], True, ('goal_nogoal',)),
+        ('calcola_quote_mercati_gol_batch',
+         lambda: generatore.calcola_quote_mercati_gol_batch(ids_casa, ids_trasferta), False,
+         ('under_over', 'goal_nogoal')),
+        ('calcola_quote_risultato_esatto',
+         lambda: [generatore.calcola_quote_risultato_esatto(c, t) for c, t in coppie], True, ('risultato_esatto',)),
+        ('calcola_quote_risultato_esatto_batch',
+         lambda: generatore.calcola_quote_risultato_esatto_batch(ids_casa, ids_trasferta), False,
+         ('risultato_esatto',)),
+        ('simula_giornata_completa',
+         lambda: generatore.simula_giornata_completa(calendario), False, ()),
+    ]
+
+
+def misura(funzione, tempo_minimo=TEMPO_MINIMO):
+    """
+    Esegue la funzione più volte e ne misura latenza e memoria di picco
+
+    :param funzione: funzione senza argomenti da misurare
+    :param tempo_minimo: secondi minimi di misura (entro RIPETIZIONI_MIN e RIPETIZIONI_MAX)
+    :return: dizionario con ripetizioni, latenze p50/p99 in ms e memoria di picco in MB
+    """
+    latenze = []
+    inizio = time.perf_counter()
+    while len(latenze) < RIPETIZIONI_MIN or (len(latenze) < RIPETIZIONI_MAX
+                                            and time.perf_counter() - inizio < tempo_minimo):
+        t0 = time.perf_counter()
+        funzione()
+        latenze.append(time.perf_counter() - t0)
+
+    # La memoria si misura in un'esecuzione a parte: tracemalloc rallenta il codice
+    tracemalloc.start()
+    funzione()
+    _, picco = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latenze = np.array(latenze)
+    return {
+        'ripetizioni': len(latenze),
+        'latenza_p50_ms': float(np.percentile(latenze, 50) * 1000),
+        'latenza_p99_ms': float(np.percentile(latenze, 99) * 1000),
+        'memoria_picco_mb': picco / 2**20,
+    }
+
+
+def esegui_benchmark(scale=SCALE, limite_scalare=LIMITE_SCALARE, tempo_minimo=TEMPO_MINIMO, seed=0):
+    """
+    Misura tutti i mercati e la simulazione per entrambi i modelli di squadre e il Monte Carlo di main
+
+    :return: lista di dizionari, uno per (modello, metodo, scala)
+    """
+    rng = np.random.default_rng(seed)
+    risultati = []
+
+    def registra(modello, metodo, n, funzione, scalare, mercati=(), mercati_modello=()):
+        record = {'modello': modello, 'metodo': metodo, 'scala': n}
+        if mercati and not set(mercati) & set(mercati_modello):
+            # Gli altri errori non vengono intercettati: un difetto di quotazione deve fermare il benchmark
+            record['stato'] = f"non supportato: il modello non quota {', '.join(mercati)}"
+        elif scalare and n > limite_scalare:
+            record['stato'] = 'saltato'
+        else:
+            record.update(misura(funzione, tempo_minimo))
+            record['throughput'] = n / (record['latenza_p50_ms'] / 1000)
+            record['stato'] = 'ok'
+        risultati.append(record)
+        print(f"{modello:15} {metodo:38} {n:>9}  {record['stato']}"
+              + (f"  {record['throughput']:>14,.0f}/s" if record['stato'] == 'ok' else ''))
+
+    for nome_modello, modulo in MODELLI.items():
+        generatore = modulo.GeneratoreQuoteCalcioVirtuale(margine_operatore=0.10, seed=seed)
+        for n in scale:
+            for metodo, funzione, scalare, mercati in _casi_modello(generatore, n, rng):
+                registra(nome_modello, metodo, n, funzione, scalare, mercati, generatore.modello.MERCATI)
+
+    for n in scale:
+        registra('main', 'calcola_quote', n,
+                 lambda: main.calcola_quote(main.squadra_A, main.squadra_B, 'sole', num_simulazioni=n, seed=seed),
+                 False)
+
+    return risultati
+
+
+def _commit_corrente():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def confronta(risultati, riferimento, soglia=0.10):
+    """
+    Confronta il throughput con un file di risultati precedente e stampa le regressioni
+
+    :param risultati: lista di risultati correnti
+    :param riferimento: dizionario letto da un file prodotto da questo script
+    :param soglia: calo relativo di throughput oltre il quale segnalare una regressione
+    :return: lista di tuple (modello, metodo, scala, rapporto) per le regressioni trovate
+    """
+    precedenti = {(r['modello'], r['metodo'], r['scala']): r for r in riferimento['risultati'] if r['stato'] == 'ok'}
+    regressioni = []
+    print(f"\nCONFRONTO CON {riferimento.get('commit')}:")
+    for r in risultati:
+        chiave = (r['modello'], r['metodo'], r['scala'])
+        if r['stato'] != 'ok' or chiave not in precedenti:
+            continue
+        rapporto = r['throughput'] / precedenti[chiave]['throughput']
+        segnale = '  REGRESSIONE' if rapporto < 1 - soglia else ''
+        print(f"{chiave[0]:15} {chiave[1]:38} {chiave[2]:>9}  x{rapporto:.2f}{segnale}")
+        if segnale:
+            regressioni.append((*chiave, rapporto))
+    return regressioni
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dei mercati e della simulazione")
+    parser.add_argument('--scale', type=int, nargs='+', default=list(SCALE))
+    parser.add_argument('--limite-scalare', type=int, default=LIMITE_SCALARE)
+    parser.add_argument('--tempo-minimo', type=float, default=TEMPO_MINIMO)
+    parser.add_argument('--output', default='benchmark_risultati.json')
+    parser.add_argument('--confronta', help="file JSON di un'esecuzione precedente")
+    args = parser.parse_args()
+
+    risultati = esegui_benchmark(args.scale, args.limite_scalare, args.tempo_minimo)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'commit': _commit_corrente(),
+            'data': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'risultati': risultati,
+        }, f, indent=2)
+    print(f"\nRisultati salvati in {args.output}")
+
+    if args.confronta:
+        with open(args.confronta) as f:
+            confronta(risultati, json.load(f))
@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+
+# Punti assegnati per vittoria e pareggio
+PUNTI_VITTORIA = 3
+PUNTI_PAREGGIO = 1
+
+# Colonne delle statistiche di ogni squadra, nell'ordine della matrice interna
+STATISTICHE = ('giocate', 'vinte', 'pareggiate', 'perse', 'gol_fatti', 'gol_subiti', 'punti')
+
+
+class Classifica:
+    def __init__(self, nomi_squadre, punti_vittoria=PUNTI_VITTORIA, punti_pareggio=PUNTI_PAREGGIO):
+        """
+        Classifica aggiornata in modo incrementale a ogni giornata.
+
+        Le statistiche sono una matrice (squadre x STATISTICHE) e gli scontri diretti una matrice
+        (squadre x squadre) di punti e gol: ogni giornata somma solo le proprie partite, quindi
+        l'aggiornamento costa O(partite della giornata) e non dipende dalla lunghezza della stagione.
+        A parità di punti l'ordine segue la classifica avulsa: punti e differenza reti negli scontri
+        diretti tra le squadre appaiate, ricalcolati sui sottogruppi ancora appaiati, poi differenza
+        reti generale, gol fatti e id.
+
+        :param nomi_squadre: nomi delle squadre nell'ordine degli id
+        :param punti_vittoria: punti assegnati per una vittoria
+        :param punti_pareggio: punti assegnati per un pareggio
+        """
+        self.nomi = np.array(list(nomi_squadre), dtype=object)
+        self.punti_vittoria = punti_vittoria
+        self.punti_pareggio = punti_pareggio
+        num_squadre = len(self.nomi)
+        self._statistiche = np.zeros((num_squadre, len(STATISTICHE)), dtype=np.int32)
+        # _scontri[i, j] = (punti, gol fatti) della squadra i contro la squadra j
+        self._scontri = np.zeros((num_squadre, num_squadre, 2), dtype=np.int32)
+        self.giornate = 0
+        self._ordine = None
+
+    @classmethod
+    def per_generatore(cls, generatore, **parametri):
+        """
+        :param generatore: GeneratoreQuote (o una sua sottoclasse)
+        :return: Classifica vuota con le squadre del generatore
+        """
+        return cls(generatore.squadre.nomi, **parametri)
+
+    def __len__(self):
+        return len(self.nomi)
+
+    def __getitem__(self, statistica):
+        """
+        :param statistica: nome tra STATISTICHE o 'differenza_reti'
+        :return: array in sola lettura con un valore per squadra, indicizzato dall'id
+        """
+        if statistica == 'differenza_reti':
+            return self['gol_fatti'] - self['gol_subiti']
+        vista = self._statistiche[:, STATISTICHE.index(statistica)]
+        vista.flags.writeable = False
+        return vista
+
+    def aggiorna_colonne(self, ids_casa, ids_trasferta, gol_casa, gol_trasferta):
+        """
+        Aggiunge alla classifica le partite di una giornata
+
+        :param ids_casa: array di indici delle squadre di casa
+        :param ids_trasferta: array di indici delle squadre in trasferta
+        :param gol_casa: array con i gol della squadra di casa
+        :param gol_trasferta: array con i gol della squadra in trasferta
+        """
+        ids_casa = np.asarray(ids_casa, dtype=np.intp)
+        ids_trasferta = np.asarray(ids_trasferta, dtype=np.intp)
+        gol_casa = np.asarray(gol_casa, dtype=np.int32)
+        gol_trasferta = np.asarray(gol_trasferta, dtype=np.int32)
+
+        vittoria_casa = gol_casa > gol_trasferta
+        pareggio = gol_casa == gol_trasferta
+        vittoria_trasferta = gol_casa < gol_trasferta
+        punti_casa = vittoria_casa * self.punti_vittoria + pareggio * self.punti_pareggio
+        punti_trasferta = vittoria_trasferta * self.punti_vittoria + pareggio * self.punti_pareggio
+
+        # Una riga di statistiche per partita e per squadra, nell'ordine di STATISTICHE;
+        # add.at somma correttamente anche le squadre che giocano più volte nello stesso blocco
+        giocata = np.ones(len(ids_casa), dtype=np.int32)
+        np.add.at(self._statistiche, ids_casa, np.column_stack(
+            [giocata, vittoria_casa, pareggio, vittoria_trasferta, gol_casa, gol_trasferta, punti_casa]))
+        np.add.at(self._statistiche, ids_trasferta, np.column_stack(
+            [giocata, vittoria_trasferta, pareggio, vittoria_casa, gol_trasferta, gol_casa, punti_trasferta]))
+
+        np.add.at(self._scontri, (ids_casa, ids_trasferta), np.column_stack([punti_casa, gol_casa]))
+        np.add.at(self._scontri, (ids_trasferta, ids_casa), np.column_stack([punti_trasferta, gol_trasferta]))
+
+        self.giornate += 1
+        self._ordine = None
+
+    def aggiorna(self, risultati):
+        """
+        Aggiunge alla classifica i risultati di una giornata (output di simula_giornata_completa)
+
+        :param risultati: DataFrame con id_casa, id_trasferta, gol_casa, gol_trasferta
+        """
+        self.aggiorna_colonne(risultati['id_casa'].to_numpy(), risultati['id_trasferta'].to_numpy(),
+                              risultati['gol_casa'].to_numpy(), risultati['gol_trasferta'].to_numpy())
+
+    def scontri_diretti(self, ids_squadre):
+        """
+        Classifica ristretta alle partite giocate tra le squadre indicate
+
+        :param ids_squadre: array di indici delle squadre
+        :return: tuple (punti, differenza_reti) di array allineati a ids_squadre
+        """
+        ids_squadre = np.asarray(ids_squadre, dtype=np.intp)
+        scontri = self._scontri[np.ix_(ids_squadre, ids_squadre)]
+        punti = scontri[:, :, 0].sum(axis=1)
+        differenza_reti = scontri[:, :, 1].sum(axis=1) - scontri[:, :, 1].sum(axis=0)
+        return punti, differenza_reti
+
+    def ordine(self):
+        """
+        :return: array con gli id delle squadre dalla prima all'ultima (ricalcolato solo dopo un aggiornamento)
+        """
+        if self._ordine is not None:
+            return self._ordine
+
+        punti = self['punti']
+        differenza_reti = self['differenza_reti']
+        gol_fatti = self['gol_fatti']
+        ids = np.arange(len(self))
+        # lexsort ordina per l'ultima chiave, poi per le precedenti
+        ordine = np.lexsort((ids, -gol_fatti, -differenza_reti, -punti))
+
+        # Riordina ogni gruppo di squadre a pari punti con gli scontri diretti
+        punti_ordinati = punti[ordine]
+        inizi = np.flatnonzero(np.r_[True, punti_ordinati[1:] != punti_ordinati[:-1]])
+        fini = np.r_[inizi[1:], len(ordine)]
+        for inizio, fine in zip(inizi, fini):
+            if fine - inizio > 1:
+                ordine[inizio:fine] = self._ordina_pari_merito(ordine[inizio:fine], differenza_reti, gol_fatti)
+
+        ordine.flags.writeable = False
+        self._ordine = ordine
+        return ordine
+
+    def _ordina_pari_merito(self, gruppo, differenza_reti, gol_fatti):
+        """
+        Ordina un gruppo di squadre appaiate con la classifica avulsa: punti e differenza reti negli
+        scontri diretti tra le sole squadre del gruppo; i sottogruppi ancora appaiati vengono
+        riordinati allo stesso modo con gli scontri tra le sole squadre del sottogruppo, e solo
+        quando gli scontri diretti non separano più nessuno si passa a differenza reti generale,
+        gol fatti e id
+
+        :param gruppo: array di id delle squadre appaiate
+        :return: array con gli stessi id in ordine di classifica
+        """
+        punti_scontri, differenza_scontri = self.scontri_diretti(gruppo)
+        ordine = np.lexsort((gruppo, -gol_fatti[gruppo], -differenza_reti[gruppo],
+                             -differenza_scontri, -punti_scontri))
+        gruppo, punti_scontri, differenza_scontri = gruppo[ordine], punti_scontri[ordine], differenza_scontri[ordine]
+
+        appaiate = (punti_scontri[1:] == punti_scontri[:-1]) & (differenza_scontri[1:] == differenza_scontri[:-1])
+        inizi = np.flatnonzero(np.r_[True, ~appaiate])
+        fini = np.r_[inizi[1:], len(gruppo)]
+        for inizio, fine in zip(inizi, fini):
+            # Un sottogruppo uguale al gruppo non è separabile con gli scontri diretti
+            if 1 < fine - inizio < len(gruppo):
+                gruppo[inizio:fine] = self._ordina_pari_merito(gruppo[inizio:fine], differenza_reti, gol_fatti)
+        return gruppo
+
+    def posizioni(self):
+        """
+        :return: array con la posizione in classifica (da 1) di ogni squadra, indicizzato dall'id
+        """
+        posizioni = np.empty(len(self), dtype=np.intp)
+        posizioni[self.ordine()] = np.arange(1, len(self) + 1)
+        return posizioni
+
+    def in_dataframe(self):
+        """
+        :return: DataFrame della classifica, una riga per squadra dalla prima all'ultima
+        """
+        ordine = self.ordine()
+        colonne = {'posizione': np.arange(1, len(self) + 1), 'id': ordine, 'squadra': self.nomi[ordine]}
+        colonne.update({nome: self[nome][ordine] for nome in STATISTICHE[:-1]})
+        colonne['differenza_reti'] = self['differenza_reti'][ordine]
+        colonne['punti'] = self['punti'][ordine]
+        return pd.DataFrame(colonne)
+
+    def azzera(self):
+        """
+        Riporta la classifica all'inizio della stagione
+        """
+        self._statistiche[:] = 0
+        self._scontri[:] = 0
+        self.giornate = 0
+        self._ordine = None
+
+
+# Esempio d'uso
+if __name__ == "__main__":
+    from datetime import datetime
+    import time
+
+    from cloude_v3 import GeneratoreQuoteCalcioVirtuale
+
+    generatore = GeneratoreQuoteCalcioVirtuale(margine_operatore=0.10, seed=3)
+    classifica = Classifica.per_generatore(generatore)
+
+    inizio = time.perf_counter()
+    for calendario in generatore.genera_stagione(ora_inizio=datetime(2025, 8, 23, 18)):
+        classifica.aggiorna(generatore.simula_giornata_completa(calendario))
+        classifica.ordine()
+    durata = time.perf_counter() - inizio
+
+    print(f"CLASSIFICA FINALE DOPO {classifica.giornate} GIORNATE ({durata * 1000:.0f} ms):")
+    print(classifica.in_dataframe().to_string(index=False))
@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+from motore_quote import ETICHETTE_RISULTATO
+
+# Puntate di riferimento di una partita: sotto questa cifra lo spostamento delle quote resta contenuto
+LIQUIDITA = 1000.0
+# Peso dello squilibrio sulle probabilità implicite e loro spostamento massimo (0.3 = ±30%)
+SENSIBILITA = 0.5
+SPOSTAMENTO_MAX = 0.3
+
+
+class EsposizioneQuote:
+    def __init__(self, generatore, calendario, liquidita=LIQUIDITA, sensibilita=SENSIBILITA,
+                 spostamento_max=SPOSTAMENTO_MAX):
+        """
+        Esposizione per partita ed esito 1X2 aggiornata a ogni giocata, con riquotazione delle sole
+        partite che hanno ricevuto giocate.
+
+        Per ogni esito si tengono l'incassato e il pagamento dovuto se l'esito si verifica; la perdita
+        netta di un esito è il pagamento meno l'incassato totale della partita. Alla riquotazione la
+        probabilità implicita degli esiti sovraesposti sale e quella degli altri scende, centrate in modo
+        che la loro somma e quindi il margine complessivo della partita non cambino; le quote si ottengono
+        poi con calcola_quote_1x2_batch del generatore, come nel calendario.
+
+        :param generatore: GeneratoreQuote che ha quotato il calendario
+        :param calendario: DataFrame con id e probabilita_1/X/2 delle partite da seguire
+        :param liquidita: puntate di riferimento per partita, che smorzano lo squilibrio delle prime giocate
+        :param sensibilita: peso dello squilibrio relativo sulle probabilità implicite
+        :param spostamento_max: variazione relativa massima della probabilità implicita di un esito
+        """
+        self.generatore = generatore
+        self.liquidita = liquidita
+        self.sensibilita = sensibilita
+        self.spostamento_max = spostamento_max
+
+        self.ids_partite = calendario['id'].to_numpy()
+        self._righe = {id_partita: riga for riga, id_partita in enumerate(self.ids_partite.tolist())}
+        self.probabilita = calendario[['probabilita_1', 'probabilita_X', 'probabilita_2']].to_numpy(dtype=float)
+        self.quote = calendario[['quota_1', 'quota_X', 'quota_2']].to_numpy(dtype=float, copy=True)
+
+        num_partite = len(self.ids_partite)
+        self.incassato = np.zeros((num_partite, 3))
+        self.pagamenti = np.zeros((num_partite, 3))
+        self.giocate = 0
+        # Righe con giocate arrivate dopo l'ultima riquotazione
+        self._da_riquotare = set()
+
+    def _riga(self, id_partita):
+        if id_partita not in self._righe:
+            raise KeyError(f"Partita non seguita: {id_partita}")
+        return self._righe[id_partita]
+
+    def registra(self, id_partita, esito, importo, quota=None):
+        """
+        Registra una giocata singola sull'esito 1X2 di una partita
+
+        :param id_partita: id della partita
+        :param esito: codice dell'esito (0 = '1', 1 = 'X', 2 = '2', come ETICHETTE_RISULTATO)
+        :param importo: importo giocato
+        :param quota: quota concessa (default: quota corrente della partita)
+        """
+        riga = self._riga(id_partita)
+        if quota is None:
+            quota = self.quote[riga, esito]
+        self.incassato[riga, esito] += importo
+        self.pagamenti[riga, esito] += importo * quota
+        self.giocate += 1
+        self._da_riquotare.add(riga)
+
+    def registra_blocco(self, id_partita, esito, importo, quota=None):
+        """
+        Registra un blocco di giocate in un'unica passata
+
+        :param id_partita: array con l'id della partita di ogni giocata
+        :param esito: array di codici dell'esito
+        :param importo: array di importi
+        :param quota: array di quote concesse (default: quote correnti delle partite)
+        """
+        righe = np.array([self._riga(i) for i in np.asarray(id_partita).tolist()], dtype=np.intp)
+        esito = np.asarray(esito, dtype=np.intp)
+        importo = np.asarray(importo, dtype=float)
+        quota = self.quote[righe, esito] if quota is None else np.asarray(quota, dtype=float)
+        np.add.at(self.incassato, (righe, esito), importo)
+        np.add.at(self.pagamenti, (righe, esito), importo * quota)
+        self.giocate += len(righe)
+        self._da_riquotare.update(righe.tolist())
+
+    def perdita_netta(self, righe=slice(None)):
+        """
+        :param righe: righe delle partite (default: tutte)
+        :return: array (n, 3) con il risultato per l'operatore, cambiato di segno, se si verifica ciascun esito
+        """
+        return self.pagamenti[righe] - self.incassato[righe].sum(axis=1, keepdims=True)
+
+    def riquota(self):
+        """
+        Ricalcola le quote 1X2 delle sole partite che hanno ricevuto giocate dall'ultima riquotazione
+
+        :return: tuple (ids_partite, quote) delle partite riquotate, con quote array (k, 3)
+        """
+        righe = np.fromiter(self._da_riquotare, dtype=np.intp, count=len(self._da_riquotare))
+        self._da_riquotare.clear()
+        if len(righe) == 0:
+            return self.ids_partite[righe], self.quote[righe]
+
+        # Squilibrio relativo di ogni esito, centrato sulla media pesata con le probabilità
+        probabilita = self.probabilita[righe]
+        incassato = self.incassato[righe].sum(axis=1, keepdims=True)
+        squilibrio = self.perdita_netta(righe) / (incassato + self.liquidita)
+        squilibrio -= (probabilita * squilibrio).sum(axis=1, keepdims=True) / probabilita.sum(axis=1, keepdims=True)
+
+        spostamento = np.clip(self.sensibilita * squilibrio, -self.spostamento_max, self.spostamento_max)
+        quote = self.generatore.calcola_quote_1x2_batch(probabilita * (1 + spostamento))
+        self.quote[righe] = quote
+        return self.ids_partite[righe], quote
+
+    def in_dataframe(self):
+        """
+        :return: DataFrame con una riga per partita ed esito: incassato, pagamento potenziale,
+                 perdita netta e quota corrente
+        """
+        num_partite = len(self.ids_partite)
+        return pd.DataFrame({
+            'id': np.repeat(self.ids_partite, 3),
+            'esito': np.tile(ETICHETTE_RISULTATO, num_partite),
+            'incassato': self.incassato.ravel(),
+            'pagamento': self.pagamenti.ravel(),
+            'perdita_netta': self.perdita_netta().ravel(),
+            'quota': self.quote.ravel(),
+        })
+
+
+# Esempio d'uso
+if __name__ == "__main__":
+    from datetime import datetime
+    import time
+
+    from cloude_virtual import GeneratoreQuoteCalcioVirtuale
+
+    generatore = GeneratoreQuoteCalcioVirtuale(margine_operatore=0.10, seed=4)
+    calendario = next(generatore.genera_stagione(ora_inizio=datetime(2025, 8, 23, 18)))
+    esposizione = EsposizioneQuote(generatore, calendario)
+    rng = np.random.default_rng(0)
+
+    # Flusso di giocate sbilanciato sulla vittoria in casa della prima partita, riquotando ogni 1000 giocate
+    num_giocate = 100_000
+    ids = rng.choice(esposizione.ids_partite, num_giocate).tolist()
+    esiti = np.where(rng.random(num_giocate) < 0.3, 0, rng.integers(0, 3, num_giocate)).tolist()
+    ids[::5] = [esposizione.ids_partite[0]] * len(ids[::5])
+    importi = rng.gamma(2.0, 5.0, num_giocate).round(2).tolist()
+
+    quote_iniziali = esposizione.quote[0].copy()
+    inizio = time.perf_counter()
+    for i, (id_partita, esito, importo) in enumerate(zip(ids, esiti, importi)):
+        esposizione.registra(id_partita, esito, importo)
+        if i % 1000 == 999:
+            esposizione.riquota()
+    durata = time.perf_counter() - inizio
+
+    print(f"{num_giocate:,} giocate in {durata:.2f}s ({num_giocate / durata:,.0f} al secondo)")
+    print(f"Partita {esposizione.ids_partite[0]}: quote {quote_iniziali} -> {esposizione.quote[0]}")
+    print(esposizione.in_dataframe().head(6).to_string(index=False, float_format='%.2f'))
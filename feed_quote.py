@@ -0,0 +1,346 @@
+import numpy as np
+import pandas as pd
+
+from motore_quote import LINEE_UNDER_OVER, griglie_da_dizionari, quote_risultati_esatti_in_dizionari, righe_partite
+
+MAGIA = b'VQF'
+VERSIONE_FORMATO = 1
+
+# Tipo di pubblicazione: tutte le partite aperte o solo le differenze dalla pubblicazione precedente
+COMPLETA = 0
+DELTA = 1
+
+# Le quote viaggiano come interi in centesimi (il generatore le arrotonda a 2 decimali); 0 = non quotata
+SCALA_QUOTE = 100
+
+# Numero massimo di linee Under/Over descritte nell'intestazione
+NUM_LINEE_MAX = 8
+
+INTESTAZIONE = np.dtype([
+    ('magia', 'S3'),
+    ('versione', 'u1'),
+    ('tipo', 'u1'),
+    ('max_gol', 'u1'),
+    ('num_linee', 'u1'),
+    # Parte intera di ogni linea Under/Over (2 -> 2.5)
+    ('linee', 'u1', (NUM_LINEE_MAX,)),
+    ('sequenza', '<u4'),
+    ('sequenza_base', '<u4'),
+    ('num_partite', '<u4'),
+    ('num_rimosse', '<u4'),
+])
+
+
+def tipo_record(max_gol=6, num_linee=len(LINEE_UNDER_OVER)):
+    """
+    Tracciato fisso di una partita nel feed, little-endian e senza padding
+
+    :param max_gol: numero massimo di gol quotato nel risultato esatto
+    :param num_linee: numero di linee Under/Over
+    :return: numpy.dtype strutturato
+    """
+    dimensione = max_gol + 1
+    return np.dtype([
+        ('id', '<u4'),
+        ('data_ora', '<M8[ms]'),
+        ('id_casa', '<u2'),
+        ('id_trasferta', '<u2'),
+        ('quote_1x2', '<u2', (3,)),
+        # NoGoal, Goal: l'ordine dei codici di codici_esiti
+        ('quote_goal_nogoal', '<u2', (2,)),
+        ('quote_under_over', '<u4', (num_linee, 2)),
+        ('quote_risultato_esatto', '<u4', (dimensione, dimensione)),
+    ])
+
+
+def _quote_in_interi(quote, tipo):
+    quote = np.round(np.asarray(quote, dtype=float) * SCALA_QUOTE)
+    quote = np.where(np.isnan(quote), 0, quote)
+    if quote.size and quote.max() > np.iinfo(tipo).max:
+        raise ValueError(f"Quota {quote.max() / SCALA_QUOTE} non rappresentabile come {np.dtype(tipo).name}")
+    return quote.astype(tipo)
+
+
+def quote_da_interi(valori):
+    """
+    :param valori: campo di quote di un record del feed
+    :return: array float con le quote (NaN per le selezioni non quotate)
+    """
+    valori = np.asarray(valori)
+    return np.where(valori == 0, np.nan, valori / SCALA_QUOTE)
+
+
+def codifica_partite(calendario, max_gol=6, linee=LINEE_UNDER_OVER):
+    """
+    Converte un calendario quotato nei record del feed
+
+    :param calendario: DataFrame prodotto dal generatore
+    :param max_gol: NUM_AZIONI_MAX del generatore
+    :param linee: linee Under/Over di quote_under_over
+    :return: array strutturato di tipo_record(max_gol, len(linee))
+    """
+    num_partite = len(calendario)
+    partite = np.zeros(num_partite, dtype=tipo_record(max_gol, len(linee)))
+    partite['id'] = calendario['id'].to_numpy()
+    partite['data_ora'] = calendario['data_ora'].to_numpy().astype('datetime64[ms]')
+    partite['id_casa'] = calendario['id_casa'].to_numpy()
+    partite['id_trasferta'] = calendario['id_trasferta'].to_numpy()
+    partite['quote_1x2'] = _quote_in_interi(calendario[['quota_1', 'quota_X', 'quota_2']].to_numpy(), np.uint16)
+
+    if 'quota_goal' in calendario:
+        partite['quote_goal_nogoal'] = _quote_in_interi(calendario[['quota_nogoal', 'quota_goal']].to_numpy(),
+                                                        np.uint16)
+    if 'quote_under_over' in calendario:
+        chiavi = [(f"Under {linea}", f"Over {linea}") for linea in linee]
+        quote = [[(d[under], d[over]) for under, over in chiavi] for d in calendario['quote_under_over'].tolist()]
+        partite['quote_under_over'] = _quote_in_interi(np.reshape(quote, (num_partite, len(linee), 2)), np.uint32)
+    elif 'quota_under' in calendario and 2.5 in linee:
+        partite['quote_under_over'][:, list(linee).index(2.5)] = _quote_in_interi(
+            calendario[['quota_under', 'quota_over']].to_numpy(), np.uint32)
+    if 'quote_risultati_esatti' in calendario:
+        griglie = griglie_da_dizionari(calendario['quote_risultati_esatti'].tolist(), max_gol)
+        partite['quote_risultato_esatto'] = _quote_in_interi(griglie, np.uint32)
+    return partite
+
+
+def serializza(partite, tipo=COMPLETA, sequenza=0, sequenza_base=0, rimosse=(), linee=LINEE_UNDER_OVER):
+    """
+    Scrive una pubblicazione: intestazione, record delle partite e id delle partite rimosse
+
+    :param partite: array strutturato prodotto da codifica_partite
+    :param tipo: COMPLETA o DELTA
+    :param sequenza: numero della pubblicazione
+    :param sequenza_base: pubblicazione a cui si applica un DELTA
+    :param rimosse: id delle partite non più pubblicate (solo DELTA)
+    :param linee: linee Under/Over dei record
+    :return: bytes
+    """
+    if len(linee) > NUM_LINEE_MAX:
+        raise ValueError(f"Al massimo {NUM_LINEE_MAX} linee Under/Over")
+    rimosse = np.asarray(rimosse, dtype='<u4')
+    intestazione = np.zeros(1, dtype=INTESTAZIONE)
+    intestazione['magia'] = MAGIA
+    intestazione['versione'] = VERSIONE_FORMATO
+    intestazione['tipo'] = tipo
+    intestazione['max_gol'] = partite.dtype['quote_risultato_esatto'].shape[0] - 1
+    intestazione['num_linee'] = len(linee)
+    intestazione['linee'][0, :len(linee)] = np.floor(linee)
+    intestazione['sequenza'] = sequenza
+    intestazione['sequenza_base'] = sequenza_base
+    intestazione['num_partite'] = len(partite)
+    intestazione['num_rimosse'] = len(rimosse)
+    return b''.join([intestazione.tobytes(), np.ascontiguousarray(partite).tobytes(), rimosse.tobytes()])
+
+
+def decodifica(buffer):
+    """
+    Legge una pubblicazione senza copiare i dati: i record sono una vista sul buffer
+
+    :param buffer: bytes, memoryview o mmap con una pubblicazione
+    :return: tuple (intestazione, partite, rimosse) con intestazione record INTESTAZIONE,
+             partite array strutturato di tipo_record e rimosse array di id
+    """
+    intestazione = np.frombuffer(buffer, dtype=INTESTAZIONE, count=1)[0]
+    if intestazione['magia'] != MAGIA:
+        raise ValueError("Il buffer non contiene una pubblicazione del feed")
+    if intestazione['versione'] != VERSIONE_FORMATO:
+        raise ValueError(f"Versione del feed non supportata: {intestazione['versione']}")
+
+    tipo = tipo_record(int(intestazione['max_gol']), int(intestazione['num_linee']))
+    num_partite = int(intestazione['num_partite'])
+    partite = np.frombuffer(buffer, dtype=tipo, count=num_partite, offset=INTESTAZIONE.itemsize)
+    rimosse = np.frombuffer(buffer, dtype='<u4', count=int(intestazione['num_rimosse']),
+                            offset=INTESTAZIONE.itemsize + num_partite * tipo.itemsize)
+    return intestazione, partite, rimosse
+
+
+def linee_intestazione(intestazione):
+    """
+    :param intestazione: intestazione restituita da decodifica
+    :return: tuple con le linee Under/Over dei record
+    """
+    return tuple((intestazione['linee'][:intestazione['num_linee']] + 0.5).tolist())
+
+
+def partite_in_dataframe(partite, nomi_squadre=None, linee=LINEE_UNDER_OVER):
+    """
+    Ricostruisce dai record un calendario con le stesse colonne di quote del generatore
+
+    :param partite: array strutturato di tipo_record
+    :param nomi_squadre: nomi delle squadre nell'ordine degli id (default: solo gli id)
+    :param linee: linee Under/Over dei record
+    :return: DataFrame
+    """
+    quote_1x2 = quote_da_interi(partite['quote_1x2'])
+    quote_goal_nogoal = quote_da_interi(partite['quote_goal_nogoal'])
+    quote_under_over = quote_da_interi(partite['quote_under_over'])
+    colonne = {
+        'id': partite['id'].astype(np.int64),
+        'data_ora': partite['data_ora'],
+    }
+    if nomi_squadre is not None:
+        nomi_squadre = np.asarray(nomi_squadre, dtype=object)
+        colonne['squadra_casa'] = nomi_squadre[partite['id_casa']]
+        colonne['squadra_trasferta'] = nomi_squadre[partite['id_trasferta']]
+    colonne.update({
+        'id_casa': partite['id_casa'].astype(np.int64),
+        'id_trasferta': partite['id_trasferta'].astype(np.int64),
+        'quota_1': quote_1x2[:, 0],
+        'quota_X': quote_1x2[:, 1],
+        'quota_2': quote_1x2[:, 2],
+    })
+    if 2.5 in linee:
+        colonne['quota_under'] = quote_under_over[:, list(linee).index(2.5), 0]
+        colonne['quota_over'] = quote_under_over[:, list(linee).index(2.5), 1]
+    colonne['quota_goal'] = quote_goal_nogoal[:, 1]
+    colonne['quota_nogoal'] = quote_goal_nogoal[:, 0]
+    max_gol = partite.dtype['quote_risultato_esatto'].shape[0] - 1
+    colonne['quote_risultati_esatti'] = quote_risultati_esatti_in_dizionari(
+        quote_da_interi(partite['quote_risultato_esatto']), max_gol)
+    return pd.DataFrame(colonne)
+
+
+class PubblicatoreFeed:
+    def __init__(self, max_gol=6, linee=LINEE_UNDER_OVER, intervallo_completa=100):
+        """
+        Pubblica i calendari quotati nel feed binario, inviando dopo la prima pubblicazione
+        solo i record delle partite nuove o cambiate e gli id di quelle rimosse.
+
+        Ogni pubblicazione descrive tutte le partite aperte: il confronto con la precedente è
+        sui byte dei record, quindi una partita riquotata viaggia intera e una invariata non viaggia.
+
+        :param max_gol: NUM_AZIONI_MAX del generatore
+        :param linee: linee Under/Over pubblicate
+        :param intervallo_completa: ogni quante pubblicazioni inviarne una completa, per i nodi
+                                    che si collegano in ritardo o hanno perso un delta
+        """
+        self.max_gol = max_gol
+        self.linee = tuple(linee)
+        self.intervallo_completa = intervallo_completa
+        self.sequenza = 0
+        # Record dell'ultima pubblicazione, in ordine di id
+        self._partite = None
+
+    @classmethod
+    def per_generatore(cls, generatore, **parametri):
+        """
+        :param generatore: GeneratoreQuote (o una sua sottoclasse)
+        :return: PubblicatoreFeed con il numero massimo di gol del generatore
+        """
+        return cls(generatore.NUM_AZIONI_MAX, **parametri)
+
+    def pubblica(self, calendario, completa=False):
+        """
+        :param calendario: DataFrame con tutte le partite aperte, quotate dal generatore
+        :param completa: True per forzare una pubblicazione completa
+        :return: bytes della pubblicazione
+        """
+        partite = codifica_partite(calendario, self.max_gol, self.linee)
+        partite = partite[np.argsort(partite['id'], kind='stable')]
+        precedenti = self._partite
+        self.sequenza += 1
+        self._partite = partite
+
+        if completa or precedenti is None or (self.sequenza - 1) % self.intervallo_completa == 0:
+            return serializza(partite, COMPLETA, self.sequenza, linee=self.linee)
+
+        # Confronto byte per byte delle partite già pubblicate
+        righe, trovate = righe_partite(precedenti['id'], partite['id'])
+        byte = partite.view(np.uint8).reshape(len(partite), -1)
+        byte_precedenti = precedenti.view(np.uint8).reshape(len(precedenti), -1)
+        cambiate = ~trovate
+        cambiate[trovate] = (byte[trovate] != byte_precedenti[righe[trovate]]).any(axis=1)
+        rimosse = np.setdiff1d(precedenti['id'], partite['id'], assume_unique=True)
+        return serializza(partite[cambiate], DELTA, self.sequenza, self.sequenza - 1, rimosse, self.linee)
+
+
+class RicevitoreFeed:
+    def __init__(self):
+        """
+        Ricostruisce sul nodo che riceve il feed le partite aperte, applicando pubblicazioni complete e delta
+        """
+        self.sequenza = None
+        # Record delle partite aperte, in ordine di id (vista sul buffer dopo una pubblicazione completa)
+        self.partite = None
+        self.linee = LINEE_UNDER_OVER
+
+    def applica(self, buffer):
+        """
+        :param buffer: pubblicazione prodotta da PubblicatoreFeed
+        :return: array strutturato con le partite aperte dopo la pubblicazione
+        """
+        intestazione, partite, rimosse = decodifica(buffer)
+        sequenza = int(intestazione['sequenza'])
+        if intestazione['tipo'] == COMPLETA:
+            self.partite = partite
+        else:
+            if self.partite is None or intestazione['sequenza_base'] != self.sequenza:
+                raise ValueError(f"Delta {sequenza} non applicabile: serve la pubblicazione "
+                                 f"{intestazione['sequenza_base']}, ultima ricevuta {self.sequenza}")
+            tenute = ~np.isin(self.partite['id'], rimosse) & ~np.isin(self.partite['id'], partite['id'])
+            aggiornate = np.concatenate([self.partite[tenute], partite])
+            self.partite = aggiornate[np.argsort(aggiornate['id'], kind='stable')]
+        self.sequenza = sequenza
+        self.linee = linee_intestazione(intestazione)
+        return self.partite
+
+    def in_dataframe(self, nomi_squadre=None):
+        """
+        :param nomi_squadre: nomi delle squadre nell'ordine degli id (default: solo gli id)
+        :return: DataFrame delle partite aperte
+        """
+        return partite_in_dataframe(self.partite, nomi_squadre, self.linee)
+
+
+# Esempio d'uso
+if __name__ == "__main__":
+    from datetime import datetime
+    import pickle
+    import time
+
+    from cloude_virtual import GeneratoreQuoteCalcioVirtuale
+    from esposizione import EsposizioneQuote
+
+    generatore = GeneratoreQuoteCalcioVirtuale(margine_operatore=0.10, seed=6)
+    stagione = generatore.genera_stagione(ora_inizio=datetime(2025, 8, 23, 18))
+    pubblicatore = PubblicatoreFeed.per_generatore(generatore)
+    ricevitore = RicevitoreFeed()
+
+    # Prima pubblicazione completa di una giornata, confrontata con pickle e JSON del DataFrame
+    calendario = next(stagione)
+    inizio = time.perf_counter()
+    completa = pubblicatore.pubblica(calendario)
+    durata_codifica = time.perf_counter() - inizio
+    inizio = time.perf_counter()
+    ricevitore.applica(completa)
+    durata_decodifica = time.perf_counter() - inizio
+    json_calendario = calendario.to_json(orient='records', date_format='iso').encode()
+    print(f"Pubblicazione completa: {len(completa):,} byte (pickle {len(pickle.dumps(calendario)):,}, "
+          f"JSON {len(json_calendario):,}); codifica {durata_codifica * 1e3:.2f} ms, "
+          f"decodifica {durata_decodifica * 1e6:.0f} µs")
+
+    # Le giocate riquotano due partite: il delta contiene solo quelle
+    esposizione = EsposizioneQuote(generatore, calendario)
+    for id_partita in calendario['id'].iloc[:2].tolist():
+        esposizione.registra(id_partita, 0, 500.0)
+    ids_riquotati, quote = esposizione.riquota()
+    righe = calendario['id'].isin(ids_riquotati).to_numpy()
+    calendario.loc[righe, ['quota_1', 'quota_X', 'quota_2']] = quote
+    delta = pubblicatore.pubblica(calendario)
+    ricevitore.applica(delta)
+    print(f"Delta dopo la riquotazione: {len(delta):,} byte, {decodifica(delta)[0]['num_partite']} partite")
+
+    # Giornata successiva: le partite della precedente vengono rimosse
+    calendario = next(stagione)
+    delta = pubblicatore.pubblica(calendario)
+    intestazione = decodifica(delta)[0]
+    ricevitore.applica(delta)
+    ricevuto = ricevitore.in_dataframe(generatore.squadre.nomi)
+    print(f"Nuova giornata: {intestazione['num_partite']} partite, {intestazione['num_rimosse']} rimosse")
+
+    colonne = ['id', 'id_casa', 'id_trasferta', 'quota_1', 'quota_X', 'quota_2', 'quota_under', 'quota_over',
+               'quota_goal', 'quota_nogoal']
+    uguali = np.allclose(ricevuto[colonne].to_numpy(float), calendario.sort_values('id')[colonne].to_numpy(float),
+                         equal_nan=True)
+    print(f"Calendario ricostruito dal ricevitore identico all'originale: {uguali}")
+    print(ricevuto[['id', 'squadra_casa', 'squadra_trasferta', 'quota_1', 'quota_X', 'quota_2']].head().to_string(index=False))
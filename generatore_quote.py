@@ -0,0 +1,800 @@
+import asyncio
+import itertools
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+from modelli_forza import crea_modello
+from motore_quote import (LINEE_UNDER_OVER, CacheKernelRisultatiEsatti, esiti_partite, matrice_risultati_esatti,
+                          quote_mercati_gol, quote_risultati_esatti_in_dizionari, quote_under_over_in_dizionari)
+from registro_squadre import RegistroSquadre
+from storico_risultati import StoricoRisultati
+from strumentazione import NESSUNA_STRUMENTAZIONE, Strumentazione
+
+NUM_PARTITE = 10
+
+# Intervallo tra due partite consecutive del palinsesto virtuale
+INTERVALLO_PARTITE = timedelta(minutes=3)
+
+# Punti di forma guadagnati o persi per ogni vittoria o sconfitta
+VARIAZIONE_FORMA_VITTORIA = 2
+VARIAZIONE_FORMA_SCONFITTA = -2
+
+# Linea Under/Over delle colonne quota_under e quota_over, regolata da storico e regolamento
+LINEA_PRINCIPALE = 2.5
+
+
+def calendario_girone(num_squadre, andata_e_ritorno=True, rng=None):
+    """
+    Calendario all'italiana con il metodo del cerchio: la prima squadra resta ferma e le altre ruotano
+    di una posizione a ogni giornata, così ogni coppia si incontra una volta per girone. Il campo
+    alterna come nelle tabelle di Berger (metà delle partite in casa, numero minimo di doppi turni
+    casalinghi o esterni); con un numero dispari di squadre a ogni giornata una squadra riposa.
+
+    :param num_squadre: numero di squadre (almeno 2)
+    :param andata_e_ritorno: True per aggiungere il girone di ritorno a campi invertiti
+    :param rng: numpy.random.Generator per assegnare le squadre ai turni in ordine casuale (None = in ordine di id)
+    :return: tuple (ids_casa, ids_trasferta) di array (num_giornate, partite_per_giornata)
+    """
+    if num_squadre < 2:
+        raise ValueError("Servono almeno due squadre per un calendario")
+
+    # Con un numero dispari di squadre si aggiunge una squadra fittizia: chi la incontra riposa
+    n = num_squadre + num_squadre % 2
+    giornate = np.arange(n - 1)[:, None]
+    turni = np.arange(n // 2)
+
+    # Posizioni sul cerchio a ogni giornata: 0 fissa, le altre ruotate; la posizione i incontra la n-1-i
+    posizioni = np.empty((n - 1, n), dtype=np.intp)
+    posizioni[:, 0] = 0
+    posizioni[:, 1:] = (giornate + np.arange(n - 1)) % (n - 1) + 1
+    prima, seconda = posizioni[:, turni], posizioni[:, n - 1 - turni]
+
+    # La squadra fissa alterna casa e trasferta, negli altri turni gioca in casa la seconda nei turni dispari
+    inverti = np.where(turni == 0, giornate % 2 == 1, turni % 2 == 1)
+    ids_casa = np.where(inverti, seconda, prima)
+    ids_trasferta = np.where(inverti, prima, seconda)
+
+    if n != num_squadre:
+        # Toglie da ogni giornata la partita della squadra fittizia
+        giocate = (ids_casa != num_squadre) & (ids_trasferta != num_squadre)
+        ids_casa = ids_casa[giocate].reshape(n - 1, -1)
+        ids_trasferta = ids_trasferta[giocate].reshape(n - 1, -1)
+
+    if rng is not None:
+        squadre = rng.permutation(num_squadre)
+        ids_casa, ids_trasferta = squadre[ids_casa], squadre[ids_trasferta]
+
+    if andata_e_ritorno:
+        ids_casa, ids_trasferta = np.concatenate([ids_casa, ids_trasferta]), np.concatenate([ids_trasferta, ids_casa])
+    return ids_casa, ids_trasferta
+
+class GeneratoreQuote:
+    # Numero di partite predefinito di un calendario o di un blocco del palinsesto
+    NUM_PARTITE = NUM_PARTITE
+
+    def __init__(self, modello='attacco_difesa', margine_operatore=0.10, seed=None):
+        """
+        Generatore di quote per partite di calcio virtuali, comune a tutti i modelli di forza:
+        calendario, quotazione vettoriale, cache dei kernel, simulazione e regolamento sono
+        condivisi, il modello fornisce solo squadre, probabilità 1X2 base e medie gol
+
+        :param modello: nome di un modello registrato in modelli_forza o istanza di ModelloForza
+        :param margine_operatore: percentuale di margine che l'operatore vuole mantenere (0.10 = 10%)
+        :param seed: seme del generatore casuale (intero o numpy.random.SeedSequence);
+                     con lo stesso seme calendari e risultati vengono riprodotti identici
+        """
+        self.modello = crea_modello(modello)
+        self.margine_operatore = margine_operatore
+
+        # Tutta la casualità del campionato passa da questo generatore, mai dallo stato globale
+        self._seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self._seed_sequence)
+
+        # Timer e contatori dei punti caldi: non fanno nulla finché non si collega un sink
+        self.strumenti = NESSUNA_STRUMENTAZIONE
+
+        # Registro a colonne NumPy: le quotazioni leggono gli array senza passare da pandas
+        self.squadre = RegistroSquadre.da_dataframe(self._crea_squadre_virtuali())
+        self.NUM_AZIONI_MAX = 6
+
+        # Kernel del risultato esatto già calcolati, riusati dalle partite con la stessa coppia di forze;
+        # sostituibile con una cache quantizzata, es. CacheKernelRisultatiEsatti(quantizzazione=0.01)
+        self.cache_kernel = CacheKernelRisultatiEsatti()
+
+        # Tabella delle probabilità 1X2 base (senza variazione casuale) per ogni coppia casa/trasferta
+        self._costruisci_tabella_coppie()
+
+        # Partite quotate e non ancora giocate, riquotate quando cambia la forza delle loro squadre
+        self.partite_aperte = None
+        # Squadre ricalcolate nella tabella delle coppie le cui partite aperte non sono ancora state riquotate
+        self._squadre_da_riquotare = set()
+        # Indice squadra -> righe delle partite aperte: le righe di una squadra sono
+        # _righe_per_squadra[_inizi_squadre[id]:_inizi_squadre[id + 1]]
+        self._righe_per_squadra = np.zeros(0, dtype=np.intp)
+        self._inizi_squadre = np.zeros(1, dtype=np.intp)
+
+    @property
+    def LIMITE_GOL_PER_SQUADRA(self):
+        # True se il limite NUM_AZIONI_MAX del risultato esatto vale per ciascuna squadra, False per i gol totali
+        return self.modello.LIMITE_GOL_PER_SQUADRA
+
+    @property
+    def squadre_virtuali(self):
+        """
+        Copia delle squadre in formato DataFrame, per la visualizzazione.
+        Le modifiche vanno fatte con self.squadre.aggiorna.
+        """
+        return self.squadre.in_dataframe()
+
+    @squadre_virtuali.setter
+    def squadre_virtuali(self, squadre):
+        # Sostituisce l'intero campionato: registro e tabella delle coppie vengono ricostruiti
+        registro = RegistroSquadre.da_dataframe(squadre)
+        self.modello.verifica_squadre(registro)
+        self.squadre = registro
+        self._costruisci_tabella_coppie()
+
+    def _crea_squadre_virtuali(self):
+        """
+        Crea il database delle squadre virtuali del modello
+
+        :return: DataFrame con le squadre e le loro caratteristiche
+        """
+        return self.modello.crea_squadre(self.rng)
+
+    def genera_seed_figli(self, num_figli):
+        """
+        Deriva semi indipendenti dal seme del generatore, ad esempio uno per lega o per processo.
+        Le SeedSequence si possono passare ad altri processi e come seed di un nuovo generatore.
+
+        :param num_figli: numero di semi da generare
+        :return: lista di numpy.random.SeedSequence
+        """
+        return self._seed_sequence.spawn(num_figli)
+
+    def genera_rng_figli(self, num_figli):
+        """
+        Crea generatori casuali indipendenti derivati dal seme del generatore
+
+        :param num_figli: numero di generatori da creare
+        :return: lista di numpy.random.Generator
+        """
+        return [np.random.default_rng(s) for s in self.genera_seed_figli(num_figli)]
+
+    def collega_strumentazione(self, sink):
+        """
+        Attiva la misura dei punti caldi (quotazione per mercato, lettura delle squadre,
+        estrazioni casuali, costruzione dei DataFrame) inoltrando tempi e conteggi al sink
+
+        :param sink: oggetto con i metodi registra_tempo(nome, secondi) e registra_conteggio(nome, valore),
+                     ad esempio strumentazione.MetricheInMemoria
+        """
+        self.strumenti = Strumentazione(sink)
+
+    def scollega_strumentazione(self):
+        """
+        Disattiva la misura dei punti caldi
+        """
+        self.strumenti = NESSUNA_STRUMENTAZIONE
+
+    def _probabilita_base_batch(self, ids_casa, ids_trasferta):
+        """
+        Calcola le probabilità 1X2 base, prima della variazione casuale, per un insieme di coppie
+
+        :param ids_casa: array di indici delle squadre di casa
+        :param ids_trasferta: array di indici delle squadre in trasferta
+        :return: array (n, 3) con le probabilità base 1, X, 2
+        """
+        return self.modello.probabilita_base(self.squadre, ids_casa, ids_trasferta)
+
+    def _costruisci_tabella_coppie(self):
+        """
+        Precalcola le probabilità 1X2 base per tutte le coppie (casa, trasferta) del campionato
+        """
+        num_squadre = len(self.squadre)
+        ids_casa, ids_trasferta = np.divmod(np.arange(num_squadre * num_squadre), num_squadre)
+
+        self._tabella_coppie = self._probabilita_base_batch(ids_casa, ids_trasferta).reshape(num_squadre, num_squadre, 3)
+        # Le modifiche precedenti sono già incluse nella tabella, ma le partite aperte vanno riquotate
+        self.squadre.estrai_modificate()
+        self._squadre_da_riquotare = set(range(num_squadre))
+
+    def aggiorna_tabella_coppie(self, ids_squadre=None):
+        """
+        Ricalcola righe e colonne della tabella delle coppie per le squadre la cui forza è cambiata
+
+        :param ids_squadre: indici di squadre da ricalcolare in aggiunta a quelle registrate
+                            da RegistroSquadre.aggiorna dall'ultimo ricalcolo
+        :return: array con gli indici delle squadre ricalcolate
+        """
+        num_squadre = len(self.squadre)
+
+        # Squadre aggiunte o rimosse: la tabella va ricostruita da capo
+        if num_squadre != len(self._tabella_coppie):
+            self._costruisci_tabella_coppie()
+            return np.arange(num_squadre)
+
+        ids_squadre = self.squadre.estrai_modificate() if ids_squadre is None else \
+            np.union1d(np.asarray(ids_squadre, dtype=np.intp), self.squadre.estrai_modificate())
+        if ids_squadre.size == 0:
+            return ids_squadre
+        self._squadre_da_riquotare.update(ids_squadre.tolist())
+
+        tutte = np.arange(num_squadre)
+        ids_ripetuti = np.repeat(ids_squadre, num_squadre)
+        altre = np.tile(tutte, len(ids_squadre))
+        forma_blocco = (len(ids_squadre), num_squadre, 3)
+
+        # Righe: la squadra modificata gioca in casa
+        self._tabella_coppie[ids_squadre] = self._probabilita_base_batch(ids_ripetuti, altre).reshape(forma_blocco)
+        # Colonne: la squadra modificata gioca in trasferta
+        self._tabella_coppie[:, ids_squadre] = self._probabilita_base_batch(altre, ids_ripetuti).reshape(forma_blocco).transpose(1, 0, 2)
+
+        return ids_squadre
+
+    def _tabella_aggiornata(self):
+        # Le modifiche al registro non ancora incluse nella tabella vengono ricalcolate prima della lettura,
+        # così l'1X2 resta coerente con i mercati sui gol, che leggono direttamente le forze
+        if self.squadre.ha_modificate():
+            self.aggiorna_tabella_coppie()
+        return self._tabella_coppie
+
+    def aggiorna_forma_squadre(self):
+        """
+        Aggiorna la forma delle squadre per simulare variazioni nel tempo
+
+        :return: DataFrame con le partite aperte riquotate
+        """
+        num_squadre = len(self.squadre)
+        self._colonna_forma()
+        # Varia la forma di ±5 punti
+        variazione = self.rng.integers(-5, 6, num_squadre)
+        return self._applica_variazioni_forma(variazione)
+
+    def aggiorna_forma_da_risultati(self, risultati, variazione_vittoria=VARIAZIONE_FORMA_VITTORIA,
+                                    variazione_sconfitta=VARIAZIONE_FORMA_SCONFITTA):
+        """
+        Aggiorna la forma di tutte le squadre in base ai risultati di una giornata, in un'unica passata
+
+        :param risultati: DataFrame con id_casa, id_trasferta, gol_casa, gol_trasferta
+        :param variazione_vittoria: punti di forma guadagnati con una vittoria
+        :param variazione_sconfitta: punti di forma persi con una sconfitta (valore negativo)
+        :return: DataFrame con le partite aperte riquotate
+        """
+        self._colonna_forma()
+        ids_casa = risultati['id_casa'].to_numpy()
+        ids_trasferta = risultati['id_trasferta'].to_numpy()
+        differenza = np.sign(risultati['gol_casa'].to_numpy() - risultati['gol_trasferta'].to_numpy())
+
+        # Variazione per partita dal punto di vista di casa (il pareggio non cambia la forma)
+        variazione_casa = np.select([differenza > 0, differenza < 0], [variazione_vittoria, variazione_sconfitta], 0)
+        variazione_trasferta = np.select([differenza < 0, differenza > 0], [variazione_vittoria, variazione_sconfitta], 0)
+
+        # Somma le variazioni di tutte le partite di ogni squadra
+        num_squadre = len(self.squadre)
+        variazione = (np.bincount(ids_casa, weights=variazione_casa, minlength=num_squadre)
+                      + np.bincount(ids_trasferta, weights=variazione_trasferta, minlength=num_squadre))
+        return self._applica_variazioni_forma(variazione)
+
+    def _colonna_forma(self):
+        colonna = self.modello.CARATTERISTICA_FORMA
+        if colonna is None:
+            raise ValueError(f"Il modello '{self.modello.nome}' non ha una caratteristica di forma")
+        return colonna
+
+    def _verifica_mercato(self, mercato):
+        if mercato not in self.modello.MERCATI:
+            raise ValueError(f"Il modello '{self.modello.nome}' non quota il mercato '{mercato}'")
+
+    def _applica_variazioni_forma(self, variazione):
+        colonna = self._colonna_forma()
+        # Mantieni la forma entro limiti ragionevoli
+        nuova_forma = np.clip(self.squadre[colonna] + variazione, *self.modello.LIMITI_FORMA)
+        # Il registro segna le squadre la cui forma è effettivamente cambiata: solo le loro coppie
+        # e partite aperte vengono ricalcolate
+        self.squadre.aggiorna(np.arange(len(self.squadre)), **{colonna: nuova_forma})
+        return self.riquota_partite_aperte()
+
+    def apri_calendario(self, calendario):
+        """
+        Registra le partite quotate ma non ancora giocate: quando cambia la forma di una squadra
+        le sue partite aperte vengono riquotate
+
+        :param calendario: DataFrame prodotto da genera_calendario_virtuale o genera_calendario_continuo
+                           (gli id devono essere unici tra le partite aperte)
+        """
+        self.partite_aperte = calendario.copy() if self.partite_aperte is None else \
+            pd.concat([self.partite_aperte, calendario], ignore_index=True)
+        self._indicizza_partite_aperte()
+
+    def _indicizza_partite_aperte(self):
+        # Ogni partita compare due volte nell'indice, sotto la squadra di casa e sotto quella in trasferta
+        ids_casa = self.partite_aperte['id_casa'].to_numpy()
+        ids_trasferta = self.partite_aperte['id_trasferta'].to_numpy()
+        squadre = np.concatenate([ids_casa, ids_trasferta])
+        ordine = np.argsort(squadre, kind='stable')
+        self._righe_per_squadra = ordine % max(len(ids_casa), 1)
+        num_squadre = int(squadre.max()) + 1 if len(squadre) else 0
+        self._inizi_squadre = np.searchsorted(squadre[ordine], np.arange(num_squadre + 1))
+
+    def riquota_partite_aperte(self, ids_squadre=None):
+        """
+        Riquota solo le partite aperte delle squadre modificate nel registro (con RegistroSquadre.aggiorna
+        o altrove) dall'ultima riquotatura: la tabella delle coppie viene aggiornata prima, così 1X2 e
+        mercati sui gol usano le stesse forze
+
+        :param ids_squadre: indici di squadre da riquotare in aggiunta a quelle modificate
+        :return: DataFrame con le partite riquotate (vuoto se nessuna)
+        """
+        if self.partite_aperte is None:
+            return pd.DataFrame()
+        self.aggiorna_tabella_coppie(ids_squadre)
+        ids_squadre = np.array(sorted(self._squadre_da_riquotare), dtype=np.intp)
+        self._squadre_da_riquotare.clear()
+        if len(ids_squadre) == 0:
+            return self.partite_aperte.iloc[:0]
+
+        # Righe delle squadre indicate lette dall'indice, senza scorrere tutte le partite aperte
+        ids_squadre = ids_squadre[ids_squadre < len(self._inizi_squadre) - 1]
+        inizi, fini = self._inizi_squadre[ids_squadre], self._inizi_squadre[ids_squadre + 1]
+        dipendenti = np.unique(np.concatenate([self._righe_per_squadra[i:f] for i, f in zip(inizi, fini)]
+                                              or [np.zeros(0, dtype=np.intp)]))
+        if len(dipendenti) == 0:
+            return self.partite_aperte.iloc[:0]
+
+        self.strumenti.conta('calendario.partite_riquotate', len(dipendenti))
+        ids_casa = self.partite_aperte['id_casa'].to_numpy()[dipendenti]
+        ids_trasferta = self.partite_aperte['id_trasferta'].to_numpy()[dipendenti]
+        for colonna, valori in self._quota_partite(ids_casa, ids_trasferta).items():
+            aggiornata = self.partite_aperte[colonna].to_numpy(copy=True)
+            if aggiornata.dtype == object:
+                # Colonne di dizionari: l'array evita che NumPy provi a interpretarli come sequenze
+                valori = np.fromiter(valori, dtype=object, count=len(dipendenti))
+            aggiornata[dipendenti] = valori
+            self.partite_aperte[colonna] = aggiornata
+        return self.partite_aperte.iloc[dipendenti]
+
+    def regola_giornata(self, calendario, rng=None):
+        """
+        Simula le partite in calendario, le toglie dalle partite aperte, aggiorna la forma delle
+        squadre in base ai risultati (se il modello ne ha una) e riquota le sole partite aperte che ne dipendono
+
+        :param calendario: DataFrame con il calendario delle partite da giocare
+        :param rng: numpy.random.Generator dedicato alla giornata (default: self.rng)
+        :return: tuple (risultati, partite aperte riquotate)
+        """
+        risultati = self.simula_giornata_completa(calendario, rng=rng)
+        if self.partite_aperte is not None:
+            giocate = np.isin(self.partite_aperte['id'].to_numpy(), calendario['id'].to_numpy())
+            self.partite_aperte = self.partite_aperte[~giocate].reset_index(drop=True)
+            self._indicizza_partite_aperte()
+        if self.modello.CARATTERISTICA_FORMA is None:
+            return risultati, self.riquota_partite_aperte()
+        return risultati, self.aggiorna_forma_da_risultati(risultati)
+
+    def calcola_probabilita_risultati(self, id_casa, id_trasferta):
+        """
+        Calcola le probabilità dei tre possibili risultati: 1 (vittoria casa), X (pareggio), 2 (vittoria trasferta)
+
+        :param id_casa: indice della squadra di casa
+        :param id_trasferta: indice della squadra in trasferta
+        :return: dizionario con probabilità 1X2
+        """
+        # Probabilità base della coppia, precalcolate in _costruisci_tabella_coppie
+        prob_1, prob_x, prob_2 = self._tabella_aggiornata()[id_casa, id_trasferta]
+
+        # Aggiungi una piccola variazione casuale, utilizzando una distribuzione uniforme:
+        # tutti i valori tra -variazione e +variazione hanno la stessa probabilità
+        variazione = self.modello.VARIAZIONE_1X2
+        prob_1 = prob_1 * (1 + self.rng.uniform(-variazione, variazione))
+        prob_2 = prob_2 * (1 + self.rng.uniform(-variazione, variazione))
+        prob_x = prob_x * (1 + self.rng.uniform(-variazione, variazione))
+
+        # Normalizza per assicurarsi che la somma sia 1, poi applica la scala del modello
+        totale = prob_1 + prob_x + prob_2
+        scala = self.modello.SCALA_1X2
+        prob_1 = (prob_1 / totale) * scala
+        prob_x = (prob_x / totale) * scala
+        prob_2 = (prob_2 / totale) * scala
+
+        return {
+            '1': prob_1,  # Vittoria casa
+            'X': prob_x,  # Pareggio
+            '2': prob_2   # Vittoria trasferta
+        }
+
+    def calcola_quote_1x2(self, probabilita):
+        """
+        Converte le probabilità in quote con l'aggiunta del margine operatore
+
+        :param probabilita: dizionario con probabilità 1X2
+        :return: dizionario con quote 1X2
+        """
+        quote = {}
+        for risultato, prob in probabilita.items():
+            # Aggiungi il margine dell'operatore
+            prob_con_margine = prob / (1 + self.margine_operatore)
+            # Converti in quota europea (1/p) e arrotonda a 2 decimali
+            quote[risultato] = round(1 / prob_con_margine, 2)
+
+        return quote
+
+    def calcola_probabilita_risultati_batch(self, ids_casa, ids_trasferta):
+        """
+        Calcola le probabilità 1X2 di un intero blocco di partite in un'unica passata vettoriale
+
+        :param ids_casa: array di indici delle squadre di casa
+        :param ids_trasferta: array di indici delle squadre in trasferta
+        :return: array (n, 3) con le probabilità 1, X, 2 di ogni partita
+        """
+        ids_casa = np.atleast_1d(np.asarray(ids_casa, dtype=np.intp))
+        ids_trasferta = np.atleast_1d(np.asarray(ids_trasferta, dtype=np.intp))
+
+        # Probabilità base lette dalla tabella delle coppie (l'indicizzazione restituisce una copia)
+        with self.strumenti.misura('squadre.lettura'):
+            probabilita = self._tabella_aggiornata()[ids_casa, ids_trasferta]
+
+        # Variazione casuale estratta come un unico array
+        variazione = self.modello.VARIAZIONE_1X2
+        with self.strumenti.misura('rng.variazione_1x2'):
+            probabilita *= 1 + self.rng.uniform(-variazione, variazione, probabilita.shape)
+
+        # Normalizza come nella versione scalare
+        probabilita /= probabilita.sum(axis=1, keepdims=True)
+        probabilita *= self.modello.SCALA_1X2
+
+        return probabilita
+
+    def calcola_quote_1x2_batch(self, probabilita):
+        """
+        Converte un array di probabilità 1X2 in quote con l'aggiunta del margine operatore
+
+        :param probabilita: array (n, 3) con probabilità 1, X, 2
+        :return: array (n, 3) con quote 1, X, 2
+        """
+        prob_con_margine = np.asarray(probabilita) / (1 + self.margine_operatore)
+        return np.round(1 / prob_con_margine, 2)
+
+    def calcola_quote_mercati_gol_batch(self, ids_casa, ids_trasferta, linee=LINEE_UNDER_OVER):
+        """
+        Calcola le quote Under/Over su più linee e Goal/NoGoal di un blocco di partite, ricavate
+        dalla stessa griglia di probabilità del risultato esatto
+
+        :param ids_casa: array di indici delle squadre di casa
+        :param ids_trasferta: array di indici delle squadre in trasferta
+        :param linee: linee Under/Over (es. 2.5)
+        :return: tuple (quote_under_over, quote_goal_nogoal) con array (n, len(linee), 2) di quote
+                 Under e Over e array (n, 2) di quote NoGoal e Goal; NaN per il mercato che il
+                 modello non quota (ValueError se non ne quota nessuno dei due)
+        """
+        mercati = self.modello.MERCATI
+        if 'under_over' not in mercati and 'goal_nogoal' not in mercati:
+            self._verifica_mercato('under_over')
+        probabilita, _ = self.calcola_quote_risultato_esatto_batch(ids_casa, ids_trasferta)
+        quote_under_over, quote_goal_nogoal = quote_mercati_gol(probabilita, self.margine_operatore, linee)
+        if 'under_over' not in mercati:
+            quote_under_over[:] = np.nan
+        if 'goal_nogoal' not in mercati:
+            quote_goal_nogoal[:] = np.nan
+        return quote_under_over, quote_goal_nogoal
+
+    def calcola_quote_under_over(self, id_casa, id_trasferta):
+        """
+        Calcola le quote Under/Over sulle linee LINEE_UNDER_OVER
+
+        :param id_casa: indice della squadra di casa
+        :param id_trasferta: indice della squadra in trasferta
+        :return: dizionario con quote Under/Over (es. 'Under 2.5', 'Over 2.5')
+        """
+        self._verifica_mercato('under_over')
+        quote, _ = self.calcola_quote_mercati_gol_batch([id_casa], [id_trasferta])
+        return quote_under_over_in_dizionari(quote)[0]
+
+    def calcola_quote_goal_nogoal(self, id_casa, id_trasferta):
+        """
+        Calcola le quote per Goal/NoGoal
+
+        :param id_casa: indice della squadra di casa
+        :param id_trasferta: indice della squadra in trasferta
+        :return: dizionario con quote Goal/NoGoal
+        """
+        self._verifica_mercato('goal_nogoal')
+        _, quote = self.calcola_quote_mercati_gol_batch([id_casa], [id_trasferta])
+        quota_nogoal, quota_goal = quote[0].tolist()
+        return {'Goal': quota_goal, 'NoGoal': quota_nogoal}
+
+    def calcola_quote_risultato_esatto_batch(self, ids_casa, ids_trasferta):
+        """
+        Calcola probabilità e quote dei risultati esatti di un blocco di partite come griglie
+        (gol casa x gol trasferta), rispettando il vincolo di massimo NUM_AZIONI_MAX azioni totali
+
+        :param ids_casa: array di indici delle squadre di casa
+        :param ids_trasferta: array di indici delle squadre in trasferta
+        :return: tuple (probabilita, quote) di array (n, NUM_AZIONI_MAX+1, NUM_AZIONI_MAX+1)
+        """
+        ids_casa = np.atleast_1d(np.asarray(ids_casa, dtype=np.intp))
+        ids_trasferta = np.atleast_1d(np.asarray(ids_trasferta, dtype=np.intp))
+
+        # Le medie gol attese del modello sono le forze che distribuiscono le azioni
+        with self.strumenti.misura('squadre.lettura'):
+            forza_casa, forza_trasferta = self.modello.medie_gol(self.squadre, ids_casa, ids_trasferta)
+
+        return matrice_risultati_esatti(forza_casa, forza_trasferta, self.NUM_AZIONI_MAX, self.margine_operatore,
+                                        cache=self.cache_kernel)
+
+    def calcola_quote_risultato_esatto(self, id_casa, id_trasferta):
+        """
+        Calcola le quote per i risultati esatti rispettando il vincolo di massimo 6 azioni totali
+
+        :param id_casa: indice della squadra di casa
+        :param id_trasferta: indice della squadra in trasferta
+        :return: dizionario con quote per risultati esatti
+        """
+        _, quote = self.calcola_quote_risultato_esatto_batch([id_casa], [id_trasferta])
+        return quote_risultati_esatti_in_dizionari(quote, self.NUM_AZIONI_MAX)[0]
+
+    def simula_partita(self, id_casa, id_trasferta):
+        """
+        Simula il risultato di una partita
+
+        :param id_casa: indice della squadra di casa
+        :param id_trasferta: indice della squadra in trasferta
+        :return: tuple (gol_casa, gol_trasferta)
+        """
+        # Stesse estrazioni casuali della versione a blocchi con una sola partita
+        gol_casa, gol_trasferta = self.simula_partite_batch([id_casa], [id_trasferta])
+        return (int(gol_casa[0]), int(gol_trasferta[0]))
+
+    def simula_partite_batch(self, ids_casa, ids_trasferta, rng=None):
+        """
+        Simula i risultati di un blocco di partite estraendo tutti i gol in un'unica chiamata
+
+        :param ids_casa: array di indici delle squadre di casa
+        :param ids_trasferta: array di indici delle squadre in trasferta
+        :param rng: numpy.random.Generator da usare al posto di self.rng, ad esempio per rigiocare una giornata
+        :return: tuple (gol_casa, gol_trasferta) di array interi
+        """
+        rng = self.rng if rng is None else rng
+        ids_casa = np.atleast_1d(np.asarray(ids_casa, dtype=np.intp))
+        ids_trasferta = np.atleast_1d(np.asarray(ids_trasferta, dtype=np.intp))
+
+        with self.strumenti.misura('squadre.lettura'):
+            media_gol_casa, media_gol_trasferta = self.modello.medie_gol(self.squadre, ids_casa, ids_trasferta)
+
+        with self.strumenti.misura('rng.gol'):
+            return self.modello.estrai_gol(media_gol_casa, media_gol_trasferta, rng)
+
+    def genera_calendario_virtuale(self, num_partite=None):
+        """
+        Genera un calendario di partite virtuali
+
+        :param num_partite: numero di partite da generare (default: NUM_PARTITE)
+        :return: DataFrame con il calendario delle partite
+        """
+        num_partite = self.NUM_PARTITE if num_partite is None else num_partite
+        return self._genera_blocco_calendario(num_partite, id_iniziale=1, ora_base=datetime.now())
+
+    def genera_calendario_continuo(self, partite_per_blocco=None, ora_inizio=None, num_blocchi=None):
+        """
+        Genera il palinsesto continuo a blocchi: ogni blocco prosegue id e orari del precedente.
+        Nessun blocco viene trattenuto, quindi la memoria resta costante anche dopo giorni.
+
+        :param partite_per_blocco: numero di partite per blocco (default: NUM_PARTITE)
+        :param ora_inizio: orario della prima partita (default: adesso)
+        :param num_blocchi: numero di blocchi da generare (default: infiniti)
+        :return: generatore di DataFrame con il calendario di ciascun blocco
+        """
+        partite_per_blocco = self.NUM_PARTITE if partite_per_blocco is None else partite_per_blocco
+        ora_base = datetime.now() if ora_inizio is None else ora_inizio
+        id_iniziale = 1
+
+        for _ in (itertools.count() if num_blocchi is None else range(num_blocchi)):
+            yield self._genera_blocco_calendario(partite_per_blocco, id_iniziale, ora_base)
+            id_iniziale += partite_per_blocco
+            ora_base += INTERVALLO_PARTITE * partite_per_blocco
+
+    async def genera_calendario_async(self, partite_per_blocco=None, ora_inizio=None,
+                                      anticipo=timedelta(minutes=1), num_blocchi=None):
+        """
+        Versione asincrona di genera_calendario_continuo che segue l'orologio: ogni blocco viene
+        quotato in anticipo e consegnato `anticipo` prima del calcio d'inizio della sua prima partita
+
+        :param partite_per_blocco: numero di partite per blocco (default: NUM_PARTITE)
+        :param ora_inizio: orario della prima partita (default: adesso)
+        :param anticipo: timedelta tra la consegna del blocco e la sua prima partita
+        :param num_blocchi: numero di blocchi da generare (default: infiniti)
+        :return: async iterator di DataFrame con il calendario di ciascun blocco
+        """
+        for blocco in self.genera_calendario_continuo(partite_per_blocco, ora_inizio, num_blocchi):
+            # Il blocco è già quotato: attende solo il momento della pubblicazione
+            attesa = (blocco['data_ora'].iloc[0] - anticipo - datetime.now()).total_seconds()
+            if attesa > 0:
+                await asyncio.sleep(attesa)
+            yield blocco
+
+    def _genera_blocco_calendario(self, num_partite, id_iniziale, ora_base):
+        """
+        Genera e quota un blocco di partite consecutive del palinsesto
+
+        :param num_partite: numero di partite da generare
+        :param id_iniziale: id della prima partita del blocco
+        :param ora_base: orario della prima partita del blocco
+        :return: DataFrame con il calendario delle partite
+        """
+        # Tempo complessivo del blocco, da confrontare con la scadenza della giornata
+        with self.strumenti.misura('calendario.blocco'):
+            return self._quota_blocco_calendario(num_partite, id_iniziale, ora_base)
+
+    def _quota_blocco_calendario(self, num_partite, id_iniziale, ora_base):
+        strumenti = self.strumenti
+        strumenti.conta('calendario.partite', num_partite)
+        num_squadre = len(self.squadre)
+
+        # Seleziona due squadre diverse casualmente: la trasferta è estratta
+        # tra le altre num_squadre-1 squadre, senza ripetere l'estrazione
+        with strumenti.misura('rng.squadre'):
+            ids_casa = self.rng.integers(0, num_squadre, num_partite)
+            ids_trasferta = (ids_casa + self.rng.integers(1, num_squadre, num_partite)) % num_squadre
+
+        return self._crea_calendario(ids_casa, ids_trasferta, id_iniziale, ora_base)
+
+    def _crea_calendario(self, ids_casa, ids_trasferta, id_iniziale, ora_base, intervallo=INTERVALLO_PARTITE):
+        """
+        Quota un insieme di partite in un'unica passata e ne costruisce il calendario
+
+        :param ids_casa: array di indici delle squadre di casa
+        :param ids_trasferta: array di indici delle squadre in trasferta
+        :param id_iniziale: id della prima partita
+        :param ora_base: orario della prima partita
+        :param intervallo: timedelta tra due partite consecutive (0 se si giocano in contemporanea)
+        :return: DataFrame con il calendario delle partite
+        """
+        num_partite = len(ids_casa)
+        colonne_quote = self._quota_partite(ids_casa, ids_trasferta)
+
+        with self.strumenti.misura('calendario.dataframe'):
+            # Orario della partita (ogni 3 minuti per le scommesse virtuali)
+            orari = [ora_base + intervallo * i for i in range(num_partite)]
+
+            nomi = self.squadre.nomi
+
+            return pd.DataFrame({
+                'id': np.arange(id_iniziale, id_iniziale + num_partite),
+                'data_ora': orari,
+                'squadra_casa': nomi[ids_casa],
+                'squadra_trasferta': nomi[ids_trasferta],
+                'id_casa': ids_casa,
+                'id_trasferta': ids_trasferta,
+                **colonne_quote
+            })
+
+    def genera_stagione(self, andata_e_ritorno=True, ora_inizio=None, intervallo_giornate=INTERVALLO_PARTITE,
+                        mescola=True):
+        """
+        Genera la stagione di un campionato all'italiana: in ogni giornata tutte le squadre giocano
+        una sola volta, in contemporanea. Ogni giornata viene quotata in un'unica chiamata vettoriale
+        solo quando viene consegnata, quindi la forma aggiornata da regola_giornata vale già per la successiva.
+
+        :param andata_e_ritorno: True per il girone di ritorno a campi invertiti
+        :param ora_inizio: orario della prima giornata (default: adesso)
+        :param intervallo_giornate: timedelta tra due giornate consecutive
+        :param mescola: True per assegnare le squadre ai turni del calendario in ordine casuale (con self.rng)
+        :return: generatore di DataFrame, uno per giornata, con la colonna 'giornata' (da 1)
+        """
+        ids_casa, ids_trasferta = calendario_girone(len(self.squadre), andata_e_ritorno,
+                                                    rng=self.rng if mescola else None)
+        ora_base = datetime.now() if ora_inizio is None else ora_inizio
+        num_giornate, partite_per_giornata = ids_casa.shape
+
+        for giornata in range(num_giornate):
+            with self.strumenti.misura('calendario.blocco'):
+                self.strumenti.conta('calendario.partite', partite_per_giornata)
+                calendario = self._crea_calendario(ids_casa[giornata], ids_trasferta[giornata],
+                                                   1 + giornata * partite_per_giornata,
+                                                   ora_base + intervallo_giornate * giornata, intervallo=timedelta(0))
+            calendario.insert(1, 'giornata', giornata + 1)
+            yield calendario
+
+    def _quota_partite(self, ids_casa, ids_trasferta):
+        """
+        Quota tutti i mercati del modello per un insieme di partite
+
+        :param ids_casa: array di indici delle squadre di casa
+        :param ids_trasferta: array di indici delle squadre in trasferta
+        :return: dizionario {colonna del calendario: valori} con quote e probabilità
+        """
+        strumenti = self.strumenti
+        mercati = self.modello.MERCATI
+
+        # Calcola le quote 1X2 di tutte le partite in un'unica chiamata
+        with strumenti.misura('mercato.1x2'):
+            probabilita_1x2 = self.calcola_probabilita_risultati_batch(ids_casa, ids_trasferta)
+            quote_1x2 = self.calcola_quote_1x2_batch(probabilita_1x2)
+        colonne = {
+            'quota_1': quote_1x2[:, 0],
+            'quota_X': quote_1x2[:, 1],
+            'quota_2': quote_1x2[:, 2],
+            'probabilita_1': probabilita_1x2[:, 0],
+            'probabilita_X': probabilita_1x2[:, 1],
+            'probabilita_2': probabilita_1x2[:, 2],
+        }
+
+        # Una sola griglia del risultato esatto per partita alimenta tutti i mercati sui gol
+        with strumenti.misura('mercato.risultato_esatto'):
+            probabilita_griglie, quote_griglie = self.calcola_quote_risultato_esatto_batch(ids_casa, ids_trasferta)
+        if 'under_over' in mercati or 'goal_nogoal' in mercati:
+            with strumenti.misura('mercato.gol'):
+                quote_under_over, quote_goal_nogoal = quote_mercati_gol(probabilita_griglie, self.margine_operatore)
+        if 'under_over' in mercati:
+            linea_principale = LINEE_UNDER_OVER.index(LINEA_PRINCIPALE)
+            colonne['quota_under'] = quote_under_over[:, linea_principale, 0]
+            colonne['quota_over'] = quote_under_over[:, linea_principale, 1]
+        if 'goal_nogoal' in mercati:
+            colonne['quota_goal'] = quote_goal_nogoal[:, 1]
+            colonne['quota_nogoal'] = quote_goal_nogoal[:, 0]
+
+        # Griglie convertite in dizionari solo per l'output
+        with strumenti.misura('mercato.dizionari'):
+            colonne['quote_risultati_esatti'] = quote_risultati_esatti_in_dizionari(quote_griglie, self.NUM_AZIONI_MAX)
+            if 'under_over' in mercati:
+                colonne['quote_under_over'] = quote_under_over_in_dizionari(quote_under_over)
+
+        return colonne
+
+    def simula_giornata_completa(self, calendario, rng=None):
+        """
+        Simula i risultati di tutte le partite in calendario
+
+        :param calendario: DataFrame con il calendario delle partite
+        :param rng: numpy.random.Generator dedicato alla giornata (default: self.rng);
+                    ricreandolo dallo stesso seme la giornata viene rigiocata identica
+        :return: DataFrame con calendario e risultati
+        """
+        strumenti = self.strumenti
+        with strumenti.misura('simulazione.giornata'):
+            strumenti.conta('simulazione.partite', len(calendario))
+
+            # Simula tutte le partite in blocco
+            gol_casa, gol_trasferta = self.simula_partite_batch(calendario['id_casa'].to_numpy(),
+                                                                calendario['id_trasferta'].to_numpy(), rng=rng)
+
+            # Determina gli esiti di tutti i mercati in forma colonnare
+            with strumenti.misura('simulazione.esiti'):
+                esiti = esiti_partite(gol_casa, gol_trasferta, max_gol=self.NUM_AZIONI_MAX,
+                                      limite_per_squadra=self.LIMITE_GOL_PER_SQUADRA)
+
+            with strumenti.misura('simulazione.dataframe'):
+                return calendario.assign(gol_casa=gol_casa, gol_trasferta=gol_trasferta, **esiti)
+
+
+    def crea_storico(self, capacita_iniziale=1 << 16):
+        """
+        Crea uno storico colonnare compatibile con i mercati di questo generatore
+
+        :param capacita_iniziale: numero di partite preallocate
+        :return: StoricoRisultati
+        """
+        return StoricoRisultati(max_gol=self.NUM_AZIONI_MAX, limite_per_squadra=self.LIMITE_GOL_PER_SQUADRA,
+                                capacita_iniziale=capacita_iniziale)
+
+    def simula_giornata_in_storico(self, calendario, storico, rng=None):
+        """
+        Simula le partite in calendario e accoda i risultati allo storico colonnare,
+        senza costruire il DataFrame dei risultati
+
+        :param calendario: DataFrame con il calendario delle partite
+        :param storico: StoricoRisultati creato con crea_storico
+        :param rng: numpy.random.Generator dedicato alla giornata (default: self.rng)
+        :return: slice delle righe aggiunte allo storico
+        """
+        strumenti = self.strumenti
+        with strumenti.misura('simulazione.giornata'):
+            strumenti.conta('simulazione.partite', len(calendario))
+            ids_casa = calendario['id_casa'].to_numpy()
+            ids_trasferta = calendario['id_trasferta'].to_numpy()
+            gol_casa, gol_trasferta = self.simula_partite_batch(ids_casa, ids_trasferta, rng=rng)
+
+            with strumenti.misura('simulazione.storico'):
+                return storico.aggiungi(calendario['id'].to_numpy(), calendario['data_ora'].to_numpy(),
+                                        ids_casa, ids_trasferta, gol_casa, gol_trasferta)
@@ -0,0 +1,189 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+import cloude_v3
+import cloude_virtual
+from generatore_quote import GeneratoreQuote
+from modelli_forza import MODELLI_FORZA
+
+MODELLI = {
+    'cloude_v3': cloude_v3,
+    'cloude_virtual': cloude_virtual,
+}
+
+# Generatori delle leghe assegnate al processo corrente, creati da _inizializza_shard
+_LEGHE_SHARD = {}
+
+
+def _crea_leghe(configurazioni):
+    """
+    Crea generatore e palinsesto continuo di ogni lega
+
+    :param configurazioni: lista di dizionari con nome, modello (modulo in MODELLI o modello di forza
+                           registrato in modelli_forza), margine_operatore, seed e
+                           facoltativamente squadre (DataFrame) e num_partite
+    :return: dizionario {nome: (generatore, palinsesto)}
+    """
+    leghe = {}
+    for configurazione in configurazioni:
+        if configurazione['modello'] in MODELLI:
+            classe = MODELLI[configurazione['modello']].GeneratoreQuoteCalcioVirtuale
+            generatore = classe(margine_operatore=configurazione['margine_operatore'], seed=configurazione['seed'])
+        else:
+            generatore = GeneratoreQuote(configurazione['modello'], margine_operatore=configurazione['margine_operatore'],
+                                         seed=configurazione['seed'])
+        if configurazione.get('squadre') is not None:
+            generatore.squadre_virtuali = configurazione['squadre']
+        num_partite = configurazione.get('num_partite') or generatore.NUM_PARTITE
+        leghe[configurazione['nome']] = (generatore, generatore.genera_calendario_continuo(num_partite))
+    return leghe
+
+
+def _gioca_giornata_leghe(leghe):
+    """
+    Quota e simula una giornata per ciascuna lega, misurando le due fasi
+
+    :param leghe: dizionario {nome: (generatore, palinsesto)}
+    :return: lista di tuple (nome, risultati, secondi di quotazione, secondi di simulazione)
+    """
+    giornate = []
+    for nome, (generatore, palinsesto) in leghe.items():
+        inizio = time.perf_counter()
+        calendario = next(palinsesto)
+        quotato = time.perf_counter()
+        risultati = generatore.simula_giornata_completa(calendario)
+        fine = time.perf_counter()
+        giornate.append((nome, risultati, quotato - inizio, fine - quotato))
+    return giornate
+
+
+def _inizializza_shard(configurazioni):
+    # Eseguita una volta in ogni processo: le leghe restano nel processo per tutta la sessione
+    _LEGHE_SHARD.update(_crea_leghe(configurazioni))
+
+
+def _gioca_giornata_shard():
+    return _gioca_giornata_leghe(_LEGHE_SHARD)
+
+
+class GestoreLeghe:
+    def __init__(self, leghe, num_processi=None, seed=None):
+        """
+        Gestisce più campionati virtuali in parallelo, suddividendo le leghe tra processi.
+
+        Ogni shard è un processo dedicato che crea i generatori delle proprie leghe una sola volta
+        e li conserva tra una giornata e l'altra, quindi stato casuale, forma delle squadre e
+        palinsesto di ogni lega non vengono mai trasferiti tra processi.
+
+        :param leghe: lista di dizionari con 'nome', 'modello' ('cloude_v3', 'cloude_virtual' o un modello
+                      di forza registrato in modelli_forza, es. 'attacco_difesa'),
+                      'margine_operatore' e facoltativamente 'squadre' (DataFrame) e 'num_partite'
+        :param num_processi: numero di shard (default: numero di CPU, al massimo una per lega;
+                             1 = tutte le leghe nel processo corrente, senza pool)
+        :param seed: seme da cui derivare uno stream casuale indipendente per ogni lega
+        """
+        nomi = [lega['nome'] for lega in leghe]
+        if len(set(nomi)) != len(nomi):
+            raise ValueError("I nomi delle leghe devono essere unici")
+        for lega in leghe:
+            if lega['modello'] not in MODELLI and lega['modello'] not in MODELLI_FORZA:
+                raise ValueError(f"Modello sconosciuto: '{lega['modello']}'")
+
+        semi = np.random.SeedSequence(seed).spawn(len(leghe))
+        configurazioni = [{**lega, 'seed': s} for lega, s in zip(leghe, semi)]
+        self.nomi_leghe = nomi
+
+        num_processi = min(num_processi or os.cpu_count() or 1, len(leghe))
+        self._shard = []
+        if num_processi > 1:
+            # Un pool da un solo processo per shard: ogni lega gira sempre nello stesso processo
+            for i in range(num_processi):
+                self._shard.append(ProcessPoolExecutor(max_workers=1, initializer=_inizializza_shard,
+                                                       initargs=(configurazioni[i::num_processi],)))
+            self._leghe_locali = None
+        else:
+            self._leghe_locali = _crea_leghe(configurazioni)
+
+        self.giornate_giocate = 0
+        self._latenze = {nome: [] for nome in nomi}
+
+    def gioca_giornata(self):
+        """
+        Quota e simula la prossima giornata di tutte le leghe in parallelo
+
+        :return: DataFrame unico con i risultati di tutte le leghe (colonne 'lega' e 'giornata' in testa)
+        """
+        if self._leghe_locali is not None:
+            giornate = _gioca_giornata_leghe(self._leghe_locali)
+        else:
+            futures = [shard.submit(_gioca_giornata_shard) for shard in self._shard]
+            giornate = [g for future in futures for g in future.result()]
+
+        self.giornate_giocate += 1
+        per_lega = {}
+        for nome, risultati, secondi_quotazione, secondi_simulazione in giornate:
+            self._latenze[nome].append((secondi_quotazione, secondi_simulazione))
+            per_lega[nome] = risultati
+
+        # Feed combinato nell'ordine di configurazione delle leghe
+        feed = pd.concat([per_lega[nome] for nome in self.nomi_leghe], ignore_index=True)
+        feed.insert(0, 'lega', np.repeat(self.nomi_leghe, [len(per_lega[nome]) for nome in self.nomi_leghe]))
+        feed.insert(1, 'giornata', self.giornate_giocate)
+        return feed
+
+    def statistiche_latenza(self):
+        """
+        Riassume le latenze per lega sulle giornate giocate finora
+
+        :return: DataFrame con una riga per lega e latenze di quotazione e simulazione in ms
+        """
+        righe = []
+        for nome in self.nomi_leghe:
+            if not self._latenze[nome]:
+                continue
+            latenze = np.array(self._latenze[nome]) * 1000
+            totale = latenze.sum(axis=1)
+            righe.append({
+                'lega': nome,
+                'giornate': len(latenze),
+                'quotazione_media_ms': latenze[:, 0].mean(),
+                'simulazione_media_ms': latenze[:, 1].mean(),
+                'totale_p50_ms': np.percentile(totale, 50),
+                'totale_p99_ms': np.percentile(totale, 99),
+                'totale_max_ms': totale.max(),
+            })
+        return pd.DataFrame(righe)
+
+    def chiudi(self):
+        for shard in self._shard:
+            shard.shutdown()
+        self._shard = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *eccezione):
+        self.chiudi()
+        return False
+
+
+# Esempio d'uso
+if __name__ == "__main__":
+    leghe = [{'nome': f"Lega {i + 1}", 'modello': 'cloude_virtual' if i % 2 else 'cloude_v3',
+              'margine_operatore': 0.08 + 0.01 * (i % 5)} for i in range(12)]
+
+    with GestoreLeghe(leghe, seed=42) as gestore:
+        inizio = time.perf_counter()
+        for _ in range(5):
+            feed = gestore.gioca_giornata()
+        durata = time.perf_counter() - inizio
+
+        print(f"ULTIMA GIORNATA: {len(feed)} partite da {feed['lega'].nunique()} leghe")
+        print(feed[['lega', 'giornata', 'id', 'squadra_casa', 'squadra_trasferta',
+                    'quota_1', 'quota_X', 'quota_2', 'gol_casa', 'gol_trasferta']].head(10).to_string(index=False))
+        print("\nLATENZE PER LEGA:")
+        print(gestore.statistiche_latenza().to_string(index=False, float_format='%.2f'))
+        print(f"\n{gestore.giornate_giocate} giornate in {durata:.2f}s")
@@ -1,4 +1,5 @@
-import random
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 # Parametri delle squadre
 squadra_A = {'nome': 'Squadra A', 'attacco': 70, 'difesa': 60}
@@ -7,11 +8,18 @@ squadra_B = {'nome': 'Squadra B', 'attacco': 65, 'difesa': 65}
 # Condizioni virtuali
 meteo = {'sole': 1.0, 'pioggia': 0.8, 'neve': 0.6}  # Fattore di influenza sul numero di gol
 
+# Numero di partite simulate per ogni blocco vettoriale
+DIMENSIONE_BLOCCO = 100_000
+
 # Funzione per simulare una partita
-def simula_partita(squadra_A, squadra_B, meteo_corrente):
+def simula_partita(squadra_A, squadra_B, meteo_corrente, rng):
+    """
+    :param rng: numpy.random.Generator da cui estrarre i fattori casuali
+    :return: tuple (gol_A, gol_B)
+    """
     # Fattore casuale per rendere il risultato imprevedibile
-    fattore_casuale_A = random.uniform(0.5, 1.5)
-    fattore_casuale_B = random.uniform(0.5, 1.5)
+    fattore_casuale_A = rng.uniform(0.5, 1.5)
+    fattore_casuale_B = rng.uniform(0.5, 1.5)
     
     # Calcolo dei gol segnati da ciascuna squadra
     gol_A = (squadra_A['attacco'] / squadra_B['difesa']) * fattore_casuale_A * meteo[meteo_corrente]
@@ -23,38 +31,120 @@ def simula_partita(squadra_A, squadra_B, meteo_corrente):
     
     return gol_A, gol_B
 
+# Funzione per simulare un blocco di partite in forma vettoriale
+def simula_partite_blocco(squadra_A, squadra_B, meteo_corrente, num_simulazioni, rng):
+    """
+    Simula num_simulazioni partite con lo stesso modello di simula_partita, estraendo
+    tutti i fattori casuali in un'unica chiamata
+
+    :param rng: numpy.random.Generator da cui estrarre i fattori casuali
+    :return: array con i conteggi [vittorie_A, pareggi, vittorie_B]
+    """
+    fattori_casuali = rng.uniform(0.5, 1.5, size=(2, num_simulazioni))
+
+    # np.rint arrotonda all'intero pari come round()
+    gol_A = np.rint((squadra_A['attacco'] / squadra_B['difesa']) * fattori_casuali[0] * meteo[meteo_corrente])
+    gol_B = np.rint((squadra_B['attacco'] / squadra_A['difesa']) * fattori_casuali[1] * meteo[meteo_corrente])
+
+    vittorie_A = np.count_nonzero(gol_A > gol_B)
+    vittorie_B = np.count_nonzero(gol_B > gol_A)
+    return np.array([vittorie_A, num_simulazioni - vittorie_A - vittorie_B, vittorie_B])
+
+# Eseguita in ogni processo: uno stream casuale indipendente per ogni lotto di blocchi
+def _simula_lotto(squadra_A, squadra_B, meteo_corrente, num_simulazioni, seed_sequence, dimensione_blocco):
+    rng = np.random.default_rng(seed_sequence)
+    conteggi = np.zeros(3, dtype=np.int64)
+
+    for inizio in range(0, num_simulazioni, dimensione_blocco):
+        blocco = min(dimensione_blocco, num_simulazioni - inizio)
+        conteggi += simula_partite_blocco(squadra_A, squadra_B, meteo_corrente, blocco, rng)
+
+    return conteggi
+
+# Funzione per stimare le probabilità 1X2 con un Monte Carlo a blocchi, eventualmente in parallelo
+def stima_probabilita_montecarlo(squadra_A, squadra_B, meteo_corrente, num_simulazioni=10000,
+                                 errore_standard_max=None, num_processi=1, seed=None,
+                                 dimensione_blocco=DIMENSIONE_BLOCCO):
+    """
+    Stima le probabilità di vittoria A, pareggio e vittoria B.
+
+    Le simulazioni vengono eseguite a round; in ogni round ciascun processo riceve un lotto
+    con il proprio stream casuale derivato da seed, quindi il risultato dipende solo da seed
+    e dai parametri, non dall'ordine in cui i processi terminano.
+
+    :param num_simulazioni: numero di simulazioni (massimo, se errore_standard_max è impostato)
+    :param errore_standard_max: se impostato, si ferma appena l'errore standard di tutte e tre
+                                le probabilità scende sotto questa soglia
+    :param num_processi: numero di processi su cui distribuire i lotti (1 = nessun pool)
+    :param seed: seme per rendere la stima riproducibile
+    :param dimensione_blocco: numero di partite simulate per blocco vettoriale
+    :return: tuple (probabilita [A, pareggio, B], simulazioni eseguite, errore standard massimo)
+    """
+    if num_simulazioni < 1:
+        raise ValueError(f"num_simulazioni deve essere almeno 1, ricevuto {num_simulazioni}")
+    if num_processi < 1:
+        raise ValueError(f"num_processi deve essere almeno 1, ricevuto {num_processi}")
+    if dimensione_blocco < 1:
+        raise ValueError(f"dimensione_blocco deve essere almeno 1, ricevuto {dimensione_blocco}")
+    # Un blocco più grande delle simulazioni richieste non cambia il risultato
+    dimensione_blocco = min(dimensione_blocco, num_simulazioni)
+
+    seed_sequence = np.random.SeedSequence(seed)
+    conteggi = np.zeros(3, dtype=np.int64)
+    eseguite = 0
+    errore_standard = np.inf
+
+    # Con un obiettivo di precisione si controlla l'errore dopo ogni round di blocchi
+    dimensione_round = num_processi * dimensione_blocco if errore_standard_max is not None else num_simulazioni
+
+    pool = ProcessPoolExecutor(max_workers=num_processi) if num_processi > 1 else None
+    try:
+        while eseguite < num_simulazioni:
+            simulazioni_round = min(dimensione_round, num_simulazioni - eseguite)
+            base, resto = divmod(simulazioni_round, num_processi)
+            lotti = [base + (i < resto) for i in range(num_processi) if base + (i < resto) > 0]
+            streams = seed_sequence.spawn(len(lotti))
+
+            if pool is None:
+                risultati = [_simula_lotto(squadra_A, squadra_B, meteo_corrente, n, s, dimensione_blocco)
+                             for n, s in zip(lotti, streams)]
+            else:
+                risultati = pool.map(_simula_lotto, [squadra_A] * len(lotti), [squadra_B] * len(lotti),
+                                     [meteo_corrente] * len(lotti), lotti, streams,
+                                     [dimensione_blocco] * len(lotti))
+            for r in risultati:
+                conteggi += r
+            eseguite += simulazioni_round
+
+            probabilita = conteggi / eseguite
+            errore_standard = np.sqrt(probabilita * (1 - probabilita) / eseguite).max()
+            if errore_standard_max is not None and errore_standard < errore_standard_max:
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return conteggi / eseguite, eseguite, errore_standard
+
 # Funzione per simulare N partite e calcolare le probabilità
-def calcola_quote(squadra_A, squadra_B, meteo_corrente, num_simulazioni=10000):
-    vittorie_A = 0
-    vittorie_B = 0
-    pareggi = 0
-    
-    for _ in range(num_simulazioni):
-        gol_A, gol_B = simula_partita(squadra_A, squadra_B, meteo_corrente)
-        
-        if gol_A > gol_B:
-            vittorie_A += 1
-        elif gol_B > gol_A:
-            vittorie_B += 1
-        else:
-            pareggi += 1
-    
-    # Calcolo delle probabilità
-    prob_A = vittorie_A / num_simulazioni
-    prob_B = vittorie_B / num_simulazioni
-    prob_pareggio = pareggi / num_simulazioni
-    
+def calcola_quote(squadra_A, squadra_B, meteo_corrente, num_simulazioni=10000,
+                  errore_standard_max=None, num_processi=1, seed=None):
+    (prob_A, prob_pareggio, prob_B), _, _ = stima_probabilita_montecarlo(
+        squadra_A, squadra_B, meteo_corrente, num_simulazioni,
+        errore_standard_max=errore_standard_max, num_processi=num_processi, seed=seed)
+
     # Conversione in quote decimali
     quota_A = 1 / prob_A if prob_A > 0 else 0
     quota_B = 1 / prob_B if prob_B > 0 else 0
     quota_pareggio = 1 / prob_pareggio if prob_pareggio > 0 else 0
-    
+
     return quota_A, quota_B, quota_pareggio
 
 # Esempio di utilizzo
-meteo_corrente = 'sole'  # Cambia il meteo per vedere come influisce sulle quote
-quota_A, quota_B, quota_pareggio = calcola_quote(squadra_A, squadra_B, meteo_corrente)
+if __name__ == "__main__":
+    meteo_corrente = 'sole'  # Cambia il meteo per vedere come influisce sulle quote
+    quota_A, quota_B, quota_pareggio = calcola_quote(squadra_A, squadra_B, meteo_corrente)
 
-print(f"Quote per {squadra_A['nome']}: {quota_A:.2f}")
-print(f"Quote per {squadra_B['nome']}: {quota_B:.2f}")
-print(f"Quote per il pareggio: {quota_pareggio:.2f}")
+    print(f"Quote per {squadra_A['nome']}: {quota_A:.2f}")
+    print(f"Quote per {squadra_B['nome']}: {quota_B:.2f}")
+    print(f"Quote per il pareggio: {quota_pareggio:.2f}")
@@ -0,0 +1,262 @@
+import numpy as np
+import pandas as pd
+
+# Modelli di forza registrati, per nome
+MODELLI_FORZA = {}
+
+
+def registra_modello(nome):
+    """
+    Decoratore che registra una classe di modello di forza con il nome indicato
+
+    :param nome: nome con cui il modello viene richiesto a crea_modello
+    :return: decoratore di classe
+    """
+    def registra(classe):
+        if nome in MODELLI_FORZA:
+            raise ValueError(f"Modello già registrato: '{nome}'")
+        classe.nome = nome
+        MODELLI_FORZA[nome] = classe
+        return classe
+    return registra
+
+
+def crea_modello(modello, **parametri):
+    """
+    :param modello: nome di un modello registrato o istanza di ModelloForza (restituita così com'è)
+    :param parametri: argomenti passati al costruttore del modello
+    :return: istanza di ModelloForza
+    """
+    if isinstance(modello, ModelloForza):
+        return modello
+    if modello not in MODELLI_FORZA:
+        raise ValueError(f"Modello sconosciuto: '{modello}'")
+    return MODELLI_FORZA[modello](**parametri)
+
+
+class ModelloForza:
+    """
+    Strategia che descrive la forza delle squadre. Il generatore condiviso (generatore_quote)
+    si occupa di calendario, quotazione vettoriale, cache e regolamento; il modello fornisce solo
+    le squadre iniziali, le probabilità 1X2 base e le medie gol di un insieme di coppie.
+    """
+    nome = None
+    # Caratteristiche che il registro delle squadre deve contenere
+    CARATTERISTICHE = ()
+    # Mercati quotati nel calendario
+    MERCATI = ('1x2', 'risultato_esatto')
+    # Ampiezza della variazione casuale sulle probabilità 1X2 e fattore applicato dopo la normalizzazione
+    VARIAZIONE_1X2 = 0.05
+    SCALA_1X2 = 1.0
+    # True se il limite NUM_AZIONI_MAX del risultato esatto vale per ciascuna squadra, False per i gol totali
+    LIMITE_GOL_PER_SQUADRA = False
+    # Caratteristica aggiornata dai risultati (None se il modello non ha una forma) e suoi limiti
+    CARATTERISTICA_FORMA = None
+    LIMITI_FORMA = (None, None)
+
+    def crea_squadre(self, rng):
+        """
+        :param rng: numpy.random.Generator del generatore
+        :return: DataFrame con la colonna 'nome' e le CARATTERISTICHE
+        """
+        raise NotImplementedError
+
+    def probabilita_base(self, squadre, ids_casa, ids_trasferta):
+        """
+        :param squadre: RegistroSquadre
+        :param ids_casa: array di indici delle squadre di casa
+        :param ids_trasferta: array di indici delle squadre in trasferta
+        :return: array (n, 3) con le probabilità 1X2 base, prima della variazione casuale
+        """
+        raise NotImplementedError
+
+    def medie_gol(self, squadre, ids_casa, ids_trasferta):
+        """
+        Medie gol attese, usate sia come forze del risultato esatto sia per la simulazione
+
+        :param squadre: RegistroSquadre
+        :param ids_casa: array di indici delle squadre di casa
+        :param ids_trasferta: array di indici delle squadre in trasferta
+        :return: tuple (media_gol_casa, media_gol_trasferta) di array
+        """
+        raise NotImplementedError
+
+    def estrai_gol(self, media_gol_casa, media_gol_trasferta, rng):
+        """
+        Estrae i gol di un blocco di partite
+
+        :param media_gol_casa: array con le medie gol della squadra di casa
+        :param media_gol_trasferta: array con le medie gol della squadra in trasferta
+        :param rng: numpy.random.Generator
+        :return: tuple (gol_casa, gol_trasferta) di array interi
+        """
+        # Simula i gol usando una distribuzione di Poisson
+        return rng.poisson(media_gol_casa), rng.poisson(media_gol_trasferta)
+
+    def verifica_squadre(self, squadre):
+        """
+        :param squadre: RegistroSquadre da usare con il modello
+        :raise ValueError: se mancano caratteristiche richieste dal modello
+        """
+        mancanti = [c for c in self.CARATTERISTICHE if c not in squadre]
+        if mancanti:
+            raise ValueError(f"Il modello '{self.nome}' richiede le caratteristiche {mancanti}")
+
+
+@registra_modello('n_gol')
+class ModelloGolSegnati(ModelloForza):
+    """
+    Forza unica per squadra (n_gol) con probabilità 1X2 lineari nella differenza relativa
+    e un fattore sorpresa nella simulazione (modello di cloude_v3)
+    """
+    CARATTERISTICHE = ('n_gol',)
+    VARIAZIONE_1X2 = 0.25
+    SCALA_1X2 = 1.5
+
+    # Probabilità e medie gol del fattore sorpresa: nel 15% dei casi la squadra più debole segna più gol
+    PROBABILITA_SORPRESA = 0.15
+    MEDIE_SORPRESA = (0.8, 2.0)
+
+    SQUADRE = {
+        "Inter": 85,
+        "Milan": 82,
+        "Juventus": 200,
+        "Napoli": 83,
+        "Roma": 80,
+        "Lazio": 79,
+        "Atalanta": 78,
+        "Fiorentina": 75,
+        "Bologna": 72,
+        "Torino": 70,
+        "Sassuolo": 68,
+        "Udinese": 67,
+        "Empoli": 65,
+        "Monza": 64,
+        "Salernitana": 62,
+        "Lecce": 60,
+        "Verona": 63,
+        "Cagliari": 61,
+        "Genoa": 64,
+        "Como": 59
+    }
+
+    def crea_squadre(self, rng):
+        return pd.DataFrame({
+            'nome': self.SQUADRE.keys(),
+            'n_gol': self.SQUADRE.values(),
+        })
+
+    def probabilita_base(self, squadre, ids_casa, ids_trasferta):
+        ids_casa = np.asarray(ids_casa, dtype=np.intp)
+        ids_trasferta = np.asarray(ids_trasferta, dtype=np.intp)
+
+        n_gol = squadre['n_gol']
+        gol_casa = n_gol[ids_casa]
+        gol_trasferta = n_gol[ids_trasferta]
+        totale_gol = gol_casa + gol_trasferta
+
+        # Differenza tra le quote di forza delle due squadre (0 se entrambe hanno 0 gol)
+        diff_forza = np.divide(gol_casa - gol_trasferta, totale_gol,
+                               out=np.zeros(totale_gol.shape), where=totale_gol != 0)
+
+        probabilita = np.empty((len(ids_casa), 3))
+        probabilita[:, 0] = np.abs(0.5 + 0.3 * diff_forza)
+        # Probabilità squadra 2 tra 0.2 e 0.8
+        probabilita[:, 2] = np.abs(0.5 - 0.3 * diff_forza)
+        probabilita[:, 1] = 0.3 * (1 - np.abs(diff_forza))
+        probabilita[totale_gol == 0] = (0.4, 0.2, 0.4)
+
+        return probabilita
+
+    def medie_gol(self, squadre, ids_casa, ids_trasferta):
+        n_gol = squadre['n_gol']
+        n_gol_casa, n_gol_trasferta = n_gol[ids_casa], n_gol[ids_trasferta]
+        return n_gol_casa / n_gol_trasferta, n_gol_trasferta / n_gol_casa
+
+    def estrai_gol(self, media_gol_casa, media_gol_trasferta, rng):
+        # Fattore sorpresa: la squadra favorita segna la media bassa, l'altra quella alta
+        upset = rng.random(len(media_gol_casa)) < self.PROBABILITA_SORPRESA
+        casa_favorita = media_gol_casa > media_gol_trasferta
+        bassa, alta = self.MEDIE_SORPRESA
+        media_gol_casa = np.where(upset, np.where(casa_favorita, bassa, alta), media_gol_casa)
+        media_gol_trasferta = np.where(upset, np.where(casa_favorita, alta, bassa), media_gol_trasferta)
+        return super().estrai_gol(media_gol_casa, media_gol_trasferta, rng)
+
+
+@registra_modello('attacco_difesa')
+class ModelloAttaccoDifesa(ModelloForza):
+    """
+    Attacco, difesa e forma su scala 1-100, probabilità 1X2 sigmoidali nella differenza di forza
+    e gol di Poisson con vantaggio del campo (modello di cloude_virtual)
+    """
+    CARATTERISTICHE = ('attacco', 'difesa', 'forma')
+    MERCATI = ('1x2', 'under_over', 'goal_nogoal', 'risultato_esatto')
+    LIMITE_GOL_PER_SQUADRA = True
+    CARATTERISTICA_FORMA = 'forma'
+    LIMITI_FORMA = (60, 100)
+
+    # Queste quote decidono quanto pesano le statistiche di una squadra
+    PESI_FORZA = {'attacco': 0.4, 'difesa': 0.3, 'forma': 0.3}
+    # Medie storiche di gol in casa e in trasferta
+    MEDIA_GOL_CASA = 1.4
+    MEDIA_GOL_TRASFERTA = 1.1
+
+    def __init__(self, num_squadre=10):
+        """
+        :param num_squadre: numero di squadre create da crea_squadre
+        """
+        self.num_squadre = num_squadre
+
+    def crea_squadre(self, rng):
+        nomi_squadre = [f"Squadra {chr(65+i)}" for i in range(self.num_squadre)]
+
+        # Forza attacco e difesa su una scala 1-100
+        attacco = rng.integers(50, 95, self.num_squadre)
+        difesa = rng.integers(50, 95, self.num_squadre)
+
+        # Forma recente (variabile nel tempo)
+        forma = rng.integers(70, 100, self.num_squadre)
+
+        return pd.DataFrame({
+            'nome': nomi_squadre,
+            'attacco': attacco,
+            'difesa': difesa,
+            'forma': forma,
+        })
+
+    def probabilita_base(self, squadre, ids_casa, ids_trasferta):
+        ids_casa = np.asarray(ids_casa, dtype=np.intp)
+        ids_trasferta = np.asarray(ids_trasferta, dtype=np.intp)
+
+        # Calcola forza relativa considerando attacco, difesa e forma
+        pesi = self.PESI_FORZA
+        forza = squadre['attacco'] * pesi['attacco'] + squadre['difesa'] * pesi['difesa'] + squadre['forma'] * pesi['forma']
+
+        # Calcola la differenza di forza
+        diff_forza = forza[ids_casa] - forza[ids_trasferta]
+
+        # Usa una funzione sigmoidale per mappare la differenza di forza a probabilità:
+        # con diff_forza = 0 vale 35% / 30% / 35%, con diff_forza = 30 circa 51% / 30% / 19%
+        probabilita = np.empty((len(ids_casa), 3))
+        probabilita[:, 0] = 1 / (1 + np.exp(-diff_forza/30)) * 0.7  # Limita max probabilità a circa 70%
+        probabilita[:, 2] = 1 / (1 + np.exp(diff_forza/30)) * 0.7
+
+        # Il pareggio ha una probabilità base più alta nel calcio (circa 25-30%)
+        # Calcolo il pareggio come complementare della somma delle altre probabilità
+        probabilita[:, 1] = 1 - (probabilita[:, 0] + probabilita[:, 2])
+
+        return probabilita
+
+    def medie_gol(self, squadre, ids_casa, ids_trasferta):
+        attacco = squadre['attacco']
+        difesa = squadre['difesa']
+        forma = squadre['forma']
+
+        # Potenziale offensivo contro difensivo
+        off_vs_dif_casa = attacco[ids_casa] / difesa[ids_trasferta]
+        off_vs_dif_trasferta = attacco[ids_trasferta] / difesa[ids_casa]
+
+        # Aggiungi effetto della forma e medie storiche di gol in casa e in trasferta
+        media_gol_casa = off_vs_dif_casa * (forma[ids_casa] / 85) * self.MEDIA_GOL_CASA
+        media_gol_trasferta = off_vs_dif_trasferta * (forma[ids_trasferta] / 85) * self.MEDIA_GOL_TRASFERTA
+        return media_gol_casa, media_gol_trasferta
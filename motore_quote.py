@@ -0,0 +1,411 @@
+import math
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+
+# Fattore di "appiattimento" per rendere i risultati più equilibrati (più basso = quote più vicine tra loro)
+FATTORE_APPIATTIMENTO = 0.5
+
+# Media massima di gol totali usata nella Poisson (ridotta per abbassare le quote)
+MEDIA_GOL_MASSIMA = 3.5
+
+# Linee Under/Over quotate, tutte ricavate dalla griglia del risultato esatto
+LINEE_UNDER_OVER = (0.5, 1.5, 2.5, 3.5, 4.5, 5.5)
+
+# Riduzioni applicate una sola volta alle quote dei risultati più estremi
+FATTORI_PERSONALIZZATI = {
+    (5, 1): 0.8,
+    (1, 5): 0.8,
+    (5, 0): 0.85,
+    (0, 5): 0.85,
+    (6, 0): 0.8,
+    (0, 6): 0.8,
+}
+
+
+def chiavi_risultati_esatti(num_azioni_max):
+    """
+    Elenca i risultati esatti quotati, nello stesso ordine del dizionario storico
+    (per numero di gol totali, poi per gol della squadra di casa)
+
+    :param num_azioni_max: numero massimo di gol totali in una partita
+    :return: lista di tuple (gol_casa, gol_trasferta, chiave) con chiave nel formato "2-1"
+    """
+    return [(gol_casa, gol_totali - gol_casa, f"{gol_casa}-{gol_totali - gol_casa}")
+            for gol_totali in range(num_azioni_max + 1)
+            for gol_casa in range(gol_totali + 1)]
+
+
+@lru_cache(maxsize=32)
+def _tabelle_risultati_esatti(num_azioni_max):
+    """
+    Costruisce le tabelle costanti della griglia (gol casa x gol trasferta)
+
+    :param num_azioni_max: numero massimo di gol totali in una partita
+    :return: tuple (gol_totali, coefficienti binomiali, maschera dei risultati validi, fattori sulle quote)
+    """
+    dimensione = num_azioni_max + 1
+    gol = np.arange(dimensione)
+    gol_totali = gol[:, None] + gol[None, :]
+    validi = gol_totali <= num_azioni_max
+
+    binomiali = np.zeros((dimensione, dimensione))
+    fattori = np.ones((dimensione, dimensione))
+    for gol_casa, gol_trasferta, _ in chiavi_risultati_esatti(num_azioni_max):
+        binomiali[gol_casa, gol_trasferta] = math.comb(gol_casa + gol_trasferta, gol_casa)
+        fattori[gol_casa, gol_trasferta] = FATTORI_PERSONALIZZATI.get((gol_casa, gol_trasferta), 1.0)
+
+    return gol_totali, binomiali, validi, fattori
+
+
+@lru_cache(maxsize=32)
+def _fattoriali(num_azioni_max):
+    return np.array([math.factorial(k) for k in range(num_azioni_max + 1)], dtype=float)
+
+
+def pmf_poisson(medie, num_azioni_max):
+    """
+    Probabilità di avere esattamente k gol, per k = 0..num_azioni_max, con una Poisson di data media
+
+    :param medie: array con la media di gol di ogni partita
+    :param num_azioni_max: numero massimo di gol considerato
+    :return: array (n, num_azioni_max+1)
+    """
+    medie = np.asarray(medie, dtype=float)
+    gol = np.arange(num_azioni_max + 1)
+    return np.exp(-medie)[:, None] * medie[:, None] ** gol / _fattoriali(num_azioni_max)
+
+
+def griglie_probabilita_risultati_esatti(forza_casa, forza_trasferta, num_azioni_max):
+    """
+    Calcola il kernel Poisson x binomiale dei risultati esatti: la probabilità normalizzata
+    di ogni cella (gol casa, gol trasferta) per un blocco di partite.
+
+    Il numero di gol totali segue una Poisson di media min(forza_casa + forza_trasferta, 3.5),
+    troncata a num_azioni_max gol; i gol vengono poi divisi tra le due squadre con una binomiale
+    basata sulla forza relativa "appiattita".
+
+    :param forza_casa: array con la forza offensiva della squadra di casa per ogni partita
+    :param forza_trasferta: array con la forza offensiva della squadra in trasferta per ogni partita
+    :param num_azioni_max: numero massimo di gol totali in una partita
+    :return: array (n, num_azioni_max+1, num_azioni_max+1) con probabilità 0 oltre num_azioni_max gol totali
+    """
+    forza_totale = forza_casa + forza_trasferta
+    gol_totali, binomiali, _, _ = _tabelle_risultati_esatti(num_azioni_max)
+    gol = np.arange(num_azioni_max + 1)
+
+    # Probabilità di avere esattamente k gol nella partita, per k = 0..num_azioni_max
+    prob_gol_totali = pmf_poisson(np.minimum(forza_totale, MEDIA_GOL_MASSIMA), num_azioni_max)
+
+    # Distribuzione dei gol tra le squadre con il fattore di appiattimento
+    prob_casa = (forza_casa / forza_totale) ** FATTORE_APPIATTIMENTO
+    prob_trasferta = (forza_trasferta / forza_totale) ** FATTORE_APPIATTIMENTO
+    somma = prob_casa + prob_trasferta
+    potenze_casa = (prob_casa / somma)[:, None] ** gol
+    potenze_trasferta = (prob_trasferta / somma)[:, None] ** gol
+
+    probabilita = (prob_gol_totali[:, gol_totali.clip(max=num_azioni_max)] * binomiali
+                   * potenze_casa[:, :, None] * potenze_trasferta[:, None, :])
+
+    # Normalizza per assicurarsi che le probabilità sommino a 1
+    probabilita /= probabilita.sum(axis=(1, 2), keepdims=True)
+    return probabilita
+
+
+class CacheKernelRisultatiEsatti:
+    def __init__(self, dimensione_max=4096, quantizzazione=None):
+        """
+        Cache LRU limitata dei kernel del risultato esatto (vettore Poisson dei gol totali
+        distribuito sulle tabelle binomiali), indicizzati per coppia di forze e numero massimo di gol.
+        Le partite ripetute, frequenti con un roster fisso, non ricalcolano esponenziali e potenze.
+
+        :param dimensione_max: numero massimo di kernel conservati
+        :param quantizzazione: se impostata, le forze vengono arrotondate a multipli di questo passo
+                               (es. 0.01) così squadre di forza simile condividono il kernel;
+                               con None la cache non cambia le quote
+        """
+        self.dimensione_max = dimensione_max
+        self.quantizzazione = quantizzazione
+        self._griglie = OrderedDict()
+        self.hit = 0
+        self.miss = 0
+
+    def griglie(self, forza_casa, forza_trasferta, num_azioni_max):
+        """
+        Come griglie_probabilita_risultati_esatti, ma calcola solo i kernel non ancora in cache
+
+        :return: array (n, num_azioni_max+1, num_azioni_max+1)
+        """
+        if self.quantizzazione:
+            forza_casa = np.round(forza_casa / self.quantizzazione) * self.quantizzazione
+            forza_trasferta = np.round(forza_trasferta / self.quantizzazione) * self.quantizzazione
+
+        # Le partite con la stessa coppia di forze condividono un'unica ricerca in cache
+        # (la coppia viene ordinata come un numero complesso: parte reale, poi immaginaria)
+        uniche, inverso, conteggi = np.unique(forza_casa + 1j * forza_trasferta,
+                                              return_inverse=True, return_counts=True)
+        dimensione = num_azioni_max + 1
+        griglie = np.empty((len(uniche), dimensione, dimensione))
+        mancanti = []
+        for i, coppia in enumerate(uniche.tolist()):
+            chiave = (coppia, num_azioni_max)
+            griglia = self._griglie.get(chiave)
+            if griglia is None:
+                mancanti.append(i)
+            else:
+                self._griglie.move_to_end(chiave)
+                griglie[i] = griglia
+
+        if mancanti:
+            griglie[mancanti] = griglie_probabilita_risultati_esatti(uniche[mancanti].real, uniche[mancanti].imag,
+                                                                    num_azioni_max)
+            for i in mancanti:
+                # Copia: una vista terrebbe in memoria l'intero blocco finché la voce resta in cache
+                self._griglie[(complex(uniche[i]), num_azioni_max)] = griglie[i].copy()
+            while len(self._griglie) > self.dimensione_max:
+                self._griglie.popitem(last=False)
+
+        num_mancanti = int(conteggi[mancanti].sum())
+        self.miss += num_mancanti
+        self.hit += len(inverso) - num_mancanti
+        return griglie[inverso]
+
+    def statistiche(self):
+        """
+        :return: dizionario con hit, miss, tasso di hit e kernel in cache, più le statistiche
+                 della cache delle tabelle binomiali
+        """
+        totale = self.hit + self.miss
+        return {
+            'hit': self.hit,
+            'miss': self.miss,
+            'tasso_hit': self.hit / totale if totale else 0.0,
+            'dimensione': len(self._griglie),
+            'dimensione_max': self.dimensione_max,
+            'tabelle_binomiali': _tabelle_risultati_esatti.cache_info()._asdict(),
+        }
+
+    def svuota(self):
+        self._griglie.clear()
+        self.hit = 0
+        self.miss = 0
+
+
+def matrice_risultati_esatti(forza_casa, forza_trasferta, num_azioni_max, margine_operatore, cache=None):
+    """
+    Calcola probabilità e quote dei risultati esatti per un blocco di partite in forma matriciale
+    (il modello è descritto in griglie_probabilita_risultati_esatti)
+
+    :param forza_casa: array con la forza offensiva della squadra di casa per ogni partita
+    :param forza_trasferta: array con la forza offensiva della squadra in trasferta per ogni partita
+    :param num_azioni_max: numero massimo di gol totali in una partita
+    :param margine_operatore: margine dell'operatore (0.10 = 10%)
+    :param cache: CacheKernelRisultatiEsatti da cui leggere i kernel (default: calcolo diretto)
+    :return: tuple (probabilita, quote) di array (n, num_azioni_max+1, num_azioni_max+1) indicizzati
+             [partita, gol_casa, gol_trasferta]; le celle oltre num_azioni_max gol totali
+             hanno probabilità 0 e quota NaN
+    """
+    forza_casa = np.atleast_1d(np.asarray(forza_casa, dtype=float))
+    forza_trasferta = np.atleast_1d(np.asarray(forza_trasferta, dtype=float))
+
+    if cache is None:
+        probabilita = griglie_probabilita_risultati_esatti(forza_casa, forza_trasferta, num_azioni_max)
+    else:
+        probabilita = cache.griglie(forza_casa, forza_trasferta, num_azioni_max)
+
+    gol_totali, _, validi, fattori = _tabelle_risultati_esatti(num_azioni_max)
+
+    # Margine variabile (più alto per risultati con più gol)
+    margine_variabile = margine_operatore * 0.6 * (1 + gol_totali / 10)
+    with np.errstate(divide='ignore'):
+        quote = np.round(1 / (probabilita / (1 + margine_variabile)), 2)
+    quote = np.round(quote * fattori, 2)
+    quote[:, ~validi] = np.nan
+
+    return probabilita, quote
+
+
+def probabilita_mercati_gol(probabilita, linee=LINEE_UNDER_OVER):
+    """
+    Ricava dalle griglie dei risultati esatti le probabilità dell'Under su più linee e del Goal,
+    così tutti i mercati sui gol derivano dalla stessa distribuzione del risultato esatto
+
+    :param probabilita: array (n, num_azioni_max+1, num_azioni_max+1) prodotto da matrice_risultati_esatti
+    :param linee: linee Under/Over (es. 2.5)
+    :return: tuple (under, goal) con under array (n, len(linee)) e goal array (n,) con la probabilità
+             che segnino entrambe le squadre
+    """
+    probabilita = np.asarray(probabilita, dtype=float)
+    gol = np.arange(probabilita.shape[-1])
+    gol_totali = (gol[:, None] + gol[None, :]).ravel()
+
+    # Un unico prodotto matriciale somma le celle sotto ogni linea per tutte le partite
+    sotto_linea = (gol_totali[:, None] < np.asarray(linee, dtype=float)).astype(float)
+    under = probabilita.reshape(len(probabilita), -1) @ sotto_linea
+    goal = probabilita[:, 1:, 1:].sum(axis=(1, 2))
+    return under, goal
+
+
+def quote_mercati_gol(probabilita, margine_operatore, linee=LINEE_UNDER_OVER):
+    """
+    Quote Under/Over su più linee e Goal/NoGoal di un blocco di partite dalle griglie dei risultati esatti
+
+    :param probabilita: array (n, num_azioni_max+1, num_azioni_max+1) prodotto da matrice_risultati_esatti
+    :param margine_operatore: margine dell'operatore (0.10 = 10%)
+    :param linee: linee Under/Over (es. 2.5)
+    :return: tuple (quote_under_over, quote_goal_nogoal) con array (n, len(linee), 2) di quote Under e Over
+             e array (n, 2) di quote NoGoal e Goal (l'ordine dei codici di codici_esiti);
+             NaN se la selezione ha probabilità nulla
+    """
+    under, goal = probabilita_mercati_gol(probabilita, linee)
+    under_over = np.stack([under, 1 - under], axis=-1).clip(0, 1)
+    goal_nogoal = np.stack([1 - goal, goal], axis=-1).clip(0, 1)
+    return _quote_con_margine(under_over, margine_operatore), _quote_con_margine(goal_nogoal, margine_operatore)
+
+
+def _quote_con_margine(probabilita, margine_operatore):
+    with np.errstate(divide='ignore'):
+        quote = np.round(1 / (probabilita / (1 + margine_operatore)), 2)
+    return np.where(probabilita > 0, quote, np.nan)
+
+
+def quote_under_over_in_dizionari(quote, linee=LINEE_UNDER_OVER):
+    """
+    Converte le quote Under/Over prodotte da quote_mercati_gol nei dizionari {"Under 2.5": quota} per partita
+
+    :param quote: array (n, len(linee), 2)
+    :param linee: linee Under/Over delle quote
+    :return: lista di dizionari, uno per partita
+    """
+    nomi = [f"{selezione} {linea}" for linea in linee for selezione in ('Under', 'Over')]
+    return [dict(zip(nomi, riga)) for riga in np.asarray(quote).reshape(len(quote), -1).tolist()]
+
+
+def quote_risultati_esatti_in_dizionari(quote, num_azioni_max):
+    """
+    Converte la griglia delle quote dei risultati esatti nei dizionari {"2-1": quota} per partita
+
+    :param quote: array (n, num_azioni_max+1, num_azioni_max+1) prodotto da matrice_risultati_esatti
+    :param num_azioni_max: numero massimo di gol totali in una partita
+    :return: lista di dizionari, uno per partita
+    """
+    chiavi = chiavi_risultati_esatti(num_azioni_max)
+    gol_casa = [c[0] for c in chiavi]
+    gol_trasferta = [c[1] for c in chiavi]
+    nomi = [c[2] for c in chiavi]
+
+    # Una sola estrazione delle celle valide per tutte le partite
+    valori = quote[:, gol_casa, gol_trasferta].tolist()
+    return [dict(zip(nomi, riga)) for riga in valori]
+
+
+def griglie_da_dizionari(dizionari, num_azioni_max):
+    """
+    Operazione inversa di quote_risultati_esatti_in_dizionari: ricostruisce le griglie delle quote
+
+    :param dizionari: lista di dizionari {"2-1": quota}, uno per partita
+    :param num_azioni_max: numero massimo di gol totali in una partita
+    :return: array (n, num_azioni_max+1, num_azioni_max+1) con NaN nelle celle non quotate
+    """
+    chiavi = chiavi_risultati_esatti(num_azioni_max)
+    gol_casa = [c[0] for c in chiavi]
+    gol_trasferta = [c[1] for c in chiavi]
+    griglie = np.full((len(dizionari), num_azioni_max + 1, num_azioni_max + 1), np.nan)
+    if dizionari:
+        griglie[:, gol_casa, gol_trasferta] = [[d[c[2]] for c in chiavi] for d in dizionari]
+    return griglie
+
+
+def righe_partite(ids_partite, id_partita):
+    """
+    Trova la riga di ogni id_partita tra ids_partite con una ricerca binaria sugli id ordinati
+
+    :param ids_partite: array con l'id delle partite di un calendario
+    :param id_partita: array di id da cercare
+    :return: tuple (righe, trovate) di array allineati a id_partita; righe è valida solo dove trovate è True
+    """
+    id_partita = np.asarray(id_partita)
+    if len(ids_partite) == 0:
+        return np.zeros(len(id_partita), dtype=np.intp), np.zeros(len(id_partita), dtype=bool)
+    ordine = np.argsort(ids_partite, kind='stable')
+    ordinati = ids_partite[ordine]
+    posizioni = np.minimum(np.searchsorted(ordinati, id_partita), len(ordinati) - 1)
+    return ordine[posizioni], ordinati[posizioni] == id_partita
+
+
+# Etichette dei mercati, indicizzate dai codici prodotti da codici_esiti
+ETICHETTE_RISULTATO = np.array(['1', 'X', '2'], dtype=object)
+ETICHETTE_UNDER_OVER = np.array(['Under 2.5', 'Over 2.5'], dtype=object)
+ETICHETTE_GOAL_NOGOAL = np.array(['NoGoal', 'Goal'], dtype=object)
+
+
+@lru_cache(maxsize=32)
+def etichette_risultati_esatti(max_gol):
+    """
+    Etichette del risultato esatto indicizzate dal codice gol_casa * (max_gol+1) + gol_trasferta;
+    l'ultimo codice, (max_gol+1)**2, vale "Altro"
+
+    :param max_gol: numero massimo di gol quotato nel mercato del risultato esatto
+    :return: array di stringhe
+    """
+    dimensione = max_gol + 1
+    return np.array([f"{c}-{t}" for c in range(dimensione) for t in range(dimensione)] + ["Altro"], dtype=object)
+
+
+def codici_esiti(gol_casa, gol_trasferta, max_gol, limite_per_squadra=False):
+    """
+    Ricava gli esiti dei mercati come codici interi compatti, senza creare stringhe
+
+    :param gol_casa: array con i gol della squadra di casa
+    :param gol_trasferta: array con i gol della squadra in trasferta
+    :param max_gol: numero massimo di gol quotato nel mercato del risultato esatto
+    :param limite_per_squadra: se True il limite max_gol vale per ciascuna squadra,
+                               altrimenti per i gol totali della partita
+    :return: dizionario di array int8 (risultato, under_over, goal_nogoal) e int16 (risultato_esatto),
+             da leggere con ETICHETTE_* ed etichette_risultati_esatti
+    """
+    gol_casa = np.asarray(gol_casa)
+    gol_trasferta = np.asarray(gol_trasferta)
+    gol_totali = gol_casa + gol_trasferta
+
+    # 1X2: segno della differenza reti (positivo -> '1', zero -> 'X', negativo -> '2')
+    risultato = (1 - np.sign(gol_casa - gol_trasferta)).astype(np.int8)
+
+    under_over = (gol_totali > 2.5).astype(np.int8)
+    goal_nogoal = ((gol_casa > 0) & (gol_trasferta > 0)).astype(np.int8)
+
+    # Risultato esatto: i risultati non quotati finiscono tutti nell'ultimo codice, "Altro"
+    dimensione = max_gol + 1
+    if limite_per_squadra:
+        quotato = (gol_casa <= max_gol) & (gol_trasferta <= max_gol)
+    else:
+        quotato = gol_totali <= max_gol
+    risultato_esatto = np.where(quotato, gol_casa * dimensione + gol_trasferta,
+                                dimensione * dimensione).astype(np.int16)
+
+    return {
+        'risultato': risultato,
+        'under_over': under_over,
+        'goal_nogoal': goal_nogoal,
+        'risultato_esatto': risultato_esatto,
+    }
+
+
+def esiti_partite(gol_casa, gol_trasferta, max_gol, limite_per_squadra=False):
+    """
+    Ricava gli esiti dei mercati (1X2, Under/Over 2.5, Goal/NoGoal, risultato esatto) dai gol simulati
+
+    :param gol_casa: array con i gol della squadra di casa
+    :param gol_trasferta: array con i gol della squadra in trasferta
+    :param max_gol: numero massimo di gol quotato nel mercato del risultato esatto
+    :param limite_per_squadra: se True il limite max_gol vale per ciascuna squadra,
+                               altrimenti per i gol totali della partita
+    :return: dizionario di array con le colonne risultato, under_over, goal_nogoal, risultato_esatto
+    """
+    codici = codici_esiti(gol_casa, gol_trasferta, max_gol, limite_per_squadra)
+    return {
+        'risultato': ETICHETTE_RISULTATO[codici['risultato']],
+        'under_over': ETICHETTE_UNDER_OVER[codici['under_over']],
+        'goal_nogoal': ETICHETTE_GOAL_NOGOAL[codici['goal_nogoal']],
+        'risultato_esatto': etichette_risultati_esatti(max_gol)[codici['risultato_esatto']],
+    }
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+
+class RegistroSquadre:
+    def __init__(self, nomi, **caratteristiche):
+        """
+        Archivio compatto delle squadre: una colonna NumPy contigua per ogni caratteristica,
+        indicizzata dall'id intero della squadra
+
+        :param nomi: nomi delle squadre, nell'ordine degli id
+        :param caratteristiche: array con i valori di ogni caratteristica (es. n_gol, attacco, difesa, forma)
+        """
+        self.nomi = np.array(list(nomi), dtype=object)
+        self._colonne = {}
+        for nome, valori in caratteristiche.items():
+            valori = np.array(valori)
+            if len(valori) != len(self.nomi):
+                raise ValueError(f"La colonna '{nome}' ha {len(valori)} valori invece di {len(self.nomi)}")
+            self._colonne[nome] = valori
+        # Squadre modificate dopo l'ultima chiamata a estrai_modificate
+        self._modificate = set()
+
+    @classmethod
+    def da_dataframe(cls, squadre):
+        """
+        Crea il registro a partire da un DataFrame con la colonna 'nome' e le caratteristiche
+
+        :param squadre: DataFrame delle squadre, una riga per squadra nell'ordine degli id
+        :return: RegistroSquadre
+        """
+        caratteristiche = {c: squadre[c].to_numpy(copy=True) for c in squadre.columns if c != 'nome'}
+        return cls(squadre['nome'], **caratteristiche)
+
+    def in_dataframe(self):
+        """
+        Esporta il registro in un DataFrame, ad esempio per la visualizzazione
+
+        :return: DataFrame con la colonna 'nome' e una colonna per caratteristica
+        """
+        return pd.DataFrame({'nome': self.nomi, **{c: v.copy() for c, v in self._colonne.items()}})
+
+    @property
+    def colonne(self):
+        return list(self._colonne)
+
+    def __len__(self):
+        return len(self.nomi)
+
+    def __contains__(self, colonna):
+        return colonna in self._colonne
+
+    def __getitem__(self, colonna):
+        """
+        Restituisce la colonna di una caratteristica in sola lettura (nessuna copia)
+
+        :param colonna: nome della caratteristica
+        :return: array con un valore per squadra
+        """
+        vista = self._colonne[colonna].view()
+        vista.flags.writeable = False
+        return vista
+
+    def squadra(self, id_squadra):
+        """
+        Legge tutte le caratteristiche di una squadra senza costruire una Series
+
+        :param id_squadra: indice della squadra
+        :return: dizionario {caratteristica: valore}, compreso 'nome'
+        """
+        record = {c: v[id_squadra] for c, v in self._colonne.items()}
+        record['nome'] = self.nomi[id_squadra]
+        return record
+
+    def aggiorna(self, ids_squadre, **valori):
+        """
+        Modifica le caratteristiche di alcune squadre, registrando quelle effettivamente cambiate
+
+        :param ids_squadre: indice o array di indici delle squadre da modificare
+        :param valori: nuovi valori per caratteristica (scalari o array allineati a ids_squadre)
+        :return: array con gli indici delle squadre cambiate
+        """
+        ids_squadre = np.atleast_1d(np.asarray(ids_squadre, dtype=np.intp))
+        cambiate = np.zeros(len(ids_squadre), dtype=bool)
+
+        for colonna, nuovi in valori.items():
+            if colonna not in self._colonne:
+                raise KeyError(f"Caratteristica sconosciuta: '{colonna}'")
+            nuovi = np.broadcast_to(np.asarray(nuovi, dtype=self._colonne[colonna].dtype), ids_squadre.shape)
+            cambiate |= self._colonne[colonna][ids_squadre] != nuovi
+            self._colonne[colonna][ids_squadre] = nuovi
+
+        ids_cambiate = np.unique(ids_squadre[cambiate])
+        self._modificate.update(ids_cambiate.tolist())
+        return ids_cambiate
+
+    def ha_modificate(self):
+        """
+        :return: True se ci sono squadre modificate non ancora estratte con estrai_modificate
+        """
+        return bool(self._modificate)
+
+    def estrai_modificate(self):
+        """
+        Restituisce e azzera l'insieme delle squadre modificate dall'ultima chiamata
+
+        :return: array ordinato con gli indici delle squadre modificate
+        """
+        ids = np.array(sorted(self._modificate), dtype=np.intp)
+        self._modificate.clear()
+        return ids
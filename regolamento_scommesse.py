@@ -0,0 +1,301 @@
+import numpy as np
+import pandas as pd
+
+from motore_quote import codici_esiti, griglie_da_dizionari, righe_partite
+from storico_risultati import COLONNE_CATEGORICHE, etichette_esiti
+
+# Mercati regolabili: il codice di un mercato è la sua posizione, il codice di una selezione
+# è lo stesso usato per l'esito nello storico (vedi etichette_esiti)
+MERCATI = COLONNE_CATEGORICHE
+
+# Colonne del calendario con le quote di ogni selezione, nell'ordine dei codici
+COLONNE_QUOTE = {
+    'risultato': ('quota_1', 'quota_X', 'quota_2'),
+    'under_over': ('quota_under', 'quota_over'),
+    'goal_nogoal': ('quota_nogoal', 'quota_goal'),
+}
+
+# Stato di una selezione o di una scommessa; le annullate (selezioni senza quota) vengono rimborsate
+APERTA = 0
+VINTA = 1
+PERSA = 2
+ANNULLATA = 3
+ETICHETTE_STATO = np.array(['aperta', 'vinta', 'persa', 'annullata'], dtype=object)
+
+# Gli id di partita occupano i 32 bit bassi della chiave (lega, id) usata nel join con i risultati
+BIT_ID_PARTITA = 32
+
+
+def codici_selezioni(mercato, etichette, max_gol=6):
+    """
+    Converte le etichette delle selezioni (es. '1', 'Over 2.5', '2-1') nei codici usati dal regolamento
+
+    :param mercato: nome del mercato, tra MERCATI
+    :param etichette: etichetta o array di etichette
+    :param max_gol: numero massimo di gol quotato nel risultato esatto
+    :return: codice o array di codici int16
+    """
+    if mercato not in MERCATI:
+        raise ValueError(f"Mercato sconosciuto: '{mercato}'")
+    codici = pd.Index(etichette_esiti(max_gol)[mercato]).get_indexer(np.atleast_1d(etichette))
+    if (codici < 0).any():
+        raise ValueError(f"Selezioni sconosciute per il mercato '{mercato}'")
+    codici = codici.astype(np.int16)
+    return codici if np.ndim(etichette) else codici[0]
+
+
+def quote_selezioni(calendario, id_partita, mercato, selezione, max_gol=6):
+    """
+    Legge dal calendario le quote offerte per un insieme di selezioni, ad esempio per
+    fissare la quota delle scommesse al momento della giocata
+
+    :param calendario: DataFrame prodotto dal generatore (colonne id, quota_* e quote_risultati_esatti)
+    :param id_partita: array con l'id della partita di ogni selezione
+    :param mercato: array di codici di mercato (posizioni in MERCATI)
+    :param selezione: array di codici di selezione
+    :param max_gol: numero massimo di gol quotato nel risultato esatto
+    :return: array di quote (NaN se la partita o la selezione non è quotata)
+    """
+    id_partita = np.asarray(id_partita)
+    mercato = np.asarray(mercato)
+    selezione = np.asarray(selezione)
+    righe, trovate = righe_partite(calendario['id'].to_numpy(), id_partita)
+
+    quote = np.full(len(id_partita), np.nan)
+    for codice, nome in enumerate(MERCATI):
+        nel_mercato = trovate & (mercato == codice)
+        if not nel_mercato.any():
+            continue
+        if nome == 'risultato_esatto':
+            if 'quote_risultati_esatti' not in calendario:
+                continue
+            griglie = griglie_da_dizionari(calendario['quote_risultati_esatti'].tolist(), max_gol)
+            griglie = griglie.reshape(len(calendario), -1)
+            # Il codice "Altro" non ha una quota nella griglia
+            nella_griglia = nel_mercato & (selezione < griglie.shape[1])
+            quote[nella_griglia] = griglie[righe[nella_griglia], selezione[nella_griglia]]
+        elif all(c in calendario for c in COLONNE_QUOTE[nome]):
+            tabella = calendario[list(COLONNE_QUOTE[nome])].to_numpy(dtype=float)
+            quote[nel_mercato] = tabella[righe[nel_mercato], selezione[nel_mercato]]
+    return quote
+
+
+class RegolamentoScommesse:
+    def __init__(self, scommessa, id_partita, mercato, selezione, quota, importo, max_gol=6,
+                 limite_per_squadra=False, lega=None):
+        """
+        Regolamento in blocco di scommesse singole e multiple fornite come colonne NumPy.
+
+        Ogni riga delle colonne per selezione è un evento di una scommessa: una singola ha un
+        evento, una multipla più eventi con lo stesso indice di scommessa. Le selezioni vengono
+        ordinate per scommessa una sola volta, così quota totale ed esito di tutte le scommesse si
+        calcolano con ufunc.reduceat senza cicli Python. Una multipla è persa appena perde un evento
+        e vinta quando tutti i suoi eventi sono vinti, anche se giocati in giornate diverse.
+        Una scommessa con una selezione senza quota (NaN o non positiva, es. mercato non quotato)
+        viene annullata subito e rimborsata.
+
+        Le selezioni sono associate ai risultati per (lega, id di partita): con più calendari o leghe
+        che riusano gli stessi id va indicata la lega di ogni selezione e di ogni risultato.
+
+        :param scommessa: array con l'indice della scommessa di ogni selezione (0 .. len(importo)-1)
+        :param id_partita: array con l'id della partita di ogni selezione
+        :param mercato: array di codici di mercato (posizioni in MERCATI)
+        :param selezione: array di codici di selezione (vedi codici_selezioni)
+        :param quota: array con la quota di ogni selezione al momento della giocata
+        :param importo: array con l'importo di ogni scommessa
+        :param max_gol: NUM_AZIONI_MAX del generatore
+        :param limite_per_squadra: LIMITE_GOL_PER_SQUADRA del generatore
+        :param lega: array con la lega o il calendario di ogni selezione, di qualsiasi tipo
+                     (default: tutte le selezioni appartengono a un solo calendario)
+        """
+        scommessa = np.asarray(scommessa, dtype=np.int64)
+        self.importo = np.asarray(importo, dtype=float)
+        if len(scommessa) and (scommessa.min() < 0 or scommessa.max() >= len(self.importo)):
+            raise ValueError("Indice di scommessa fuori intervallo")
+        if (np.bincount(scommessa, minlength=len(self.importo)) == 0).any():
+            raise ValueError("Ogni scommessa deve avere almeno una selezione")
+
+        ordine = np.argsort(scommessa, kind='stable')
+        self.scommessa = scommessa[ordine]
+        self.id_partita = np.asarray(id_partita, dtype=np.int64)[ordine]
+        if len(self.id_partita) and (self.id_partita.min() < 0 or self.id_partita.max() >> BIT_ID_PARTITA):
+            raise ValueError(f"Gli id di partita devono essere tra 0 e 2**{BIT_ID_PARTITA} - 1")
+        self.mercato = np.asarray(mercato, dtype=np.int8)[ordine]
+        self.selezione = np.asarray(selezione, dtype=np.int16)[ordine]
+        self.quota = np.asarray(quota, dtype=float)[ordine]
+        self.max_gol = max_gol
+        self.limite_per_squadra = limite_per_squadra
+
+        # Codice intero di ogni lega, combinato con l'id di partita in un'unica chiave di join
+        if lega is None:
+            self.leghe = None
+            codici_lega = np.zeros(len(self.scommessa), dtype=np.int64)
+        else:
+            codici_lega, leghe = pd.factorize(np.asarray(lega, dtype=object)[ordine])
+            self.leghe = pd.Index(leghe)
+        self._chiavi = (np.asarray(codici_lega, dtype=np.int64) << BIT_ID_PARTITA) | self.id_partita
+
+        # Prima selezione di ogni scommessa nelle colonne ordinate
+        self._inizi = np.flatnonzero(np.r_[True, self.scommessa[1:] != self.scommessa[:-1]])
+        self.eventi = np.diff(np.r_[self._inizi, len(self.scommessa)])
+        self.quota_totale = np.multiply.reduceat(self.quota, self._inizi) if len(self.quota) else np.zeros(0)
+
+        self.stato_selezioni = np.full(len(self.scommessa), APERTA, dtype=np.int8)
+        self.stato = np.full(len(self.importo), APERTA, dtype=np.int8)
+        self.vincita = np.zeros(len(self.importo))
+
+        # Annullamento esplicito: una quota mancante renderebbe NaN la vincita e tutti i totali
+        senza_quota = ~(self.quota > 0)
+        if senza_quota.any():
+            annullate = np.unique(self.scommessa[senza_quota])
+            self.stato_selezioni[np.isin(self.scommessa, annullate)] = ANNULLATA
+            self.stato[annullate] = ANNULLATA
+            self.quota_totale[annullate] = 1.0
+            self.vincita[annullate] = self.importo[annullate]
+
+    @classmethod
+    def per_generatore(cls, generatore, scommessa, id_partita, mercato, selezione, quota, importo, lega=None):
+        """
+        :param generatore: GeneratoreQuote che produce i risultati da regolare
+        :return: RegolamentoScommesse con i parametri del risultato esatto del generatore
+        """
+        return cls(scommessa, id_partita, mercato, selezione, quota, importo, generatore.NUM_AZIONI_MAX,
+                   generatore.LIMITE_GOL_PER_SQUADRA, lega)
+
+    def __len__(self):
+        return len(self.importo)
+
+    def _chiavi_risultati(self, ids_partite, lega):
+        # Chiavi (lega, id) dei risultati e maschera dei risultati tenuti: quelli delle leghe senza
+        # scommesse sono scartati, perché ogni lega riusa gli stessi id e le loro chiavi collidono
+        if (self.leghe is None) != (lega is None):
+            raise ValueError("La lega dei risultati va indicata se e solo se è indicata quella delle scommesse")
+        if lega is None:
+            codici_lega = np.zeros(len(ids_partite), dtype=np.int64)
+        else:
+            lega = np.asarray(lega, dtype=object)
+            etichette = np.full(len(ids_partite), lega.item(), dtype=object) if lega.ndim == 0 else lega
+            codici_lega = self.leghe.get_indexer(etichette).astype(np.int64)
+        tenuti = codici_lega >= 0
+        chiavi = (codici_lega[tenuti] << BIT_ID_PARTITA) | ids_partite[tenuti]
+        if len(np.unique(chiavi)) != len(chiavi):
+            raise ValueError("Partite ripetute nei risultati: gli id devono essere unici per lega")
+        return chiavi, tenuti
+
+    def regola_colonne(self, ids_partite, gol_casa, gol_trasferta, lega=None):
+        """
+        Regola le selezioni sulle partite indicate e aggiorna lo stato delle scommesse
+
+        :param ids_partite: array con gli id delle partite concluse (unici per lega)
+        :param gol_casa: array con i gol della squadra di casa
+        :param gol_trasferta: array con i gol della squadra in trasferta
+        :param lega: lega dei risultati, unica o una per partita (obbligatoria se indicata per le scommesse)
+        :return: array con gli indici delle scommesse chiuse (vinte o perse) da questa chiamata
+        """
+        ids_partite = np.asarray(ids_partite, dtype=np.int64)
+        chiavi, tenuti = self._chiavi_risultati(ids_partite, lega)
+        codici = codici_esiti(np.asarray(gol_casa)[tenuti], np.asarray(gol_trasferta)[tenuti],
+                              self.max_gol, self.limite_per_squadra)
+        # Esiti come matrice (partite x mercati), nell'ordine di MERCATI
+        esiti = np.column_stack([codici[nome] for nome in MERCATI])
+
+        # Join per id di partita e mercato, solo sulle selezioni ancora aperte
+        aperte = np.flatnonzero(self.stato_selezioni == APERTA)
+        righe, trovate = righe_partite(chiavi, self._chiavi[aperte])
+        aperte, righe = aperte[trovate], righe[trovate]
+        vincenti = esiti[righe, self.mercato[aperte]] == self.selezione[aperte]
+        self.stato_selezioni[aperte] = np.where(vincenti, VINTA, PERSA)
+
+        # Stato delle scommesse dai loro eventi: persa se almeno uno è perso, vinta se sono tutti vinti
+        if len(self.scommessa) == 0:
+            return np.zeros(0, dtype=np.intp)
+        persa = np.maximum.reduceat(self.stato_selezioni == PERSA, self._inizi)
+        vinta = np.minimum.reduceat(self.stato_selezioni == VINTA, self._inizi)
+        nuovo_stato = np.where(persa, PERSA, np.where(vinta, VINTA, APERTA)).astype(np.int8)
+
+        chiuse = np.flatnonzero((self.stato == APERTA) & (nuovo_stato != APERTA))
+        self.stato[chiuse] = nuovo_stato[chiuse]
+        vinte = chiuse[nuovo_stato[chiuse] == VINTA]
+        self.vincita[vinte] = self.importo[vinte] * self.quota_totale[vinte]
+        return chiuse
+
+    def regola(self, risultati, lega=None):
+        """
+        Regola le scommesse sui risultati di una giornata (output di simula_giornata_completa
+        o feed di GestoreLeghe)
+
+        :param risultati: DataFrame con id, gol_casa, gol_trasferta e, se le scommesse hanno una lega, lega
+        :param lega: lega di tutti i risultati (default: colonna 'lega' se le scommesse hanno una lega)
+        :return: array con gli indici delle scommesse chiuse da questa giornata
+        """
+        if lega is None and self.leghe is not None and 'lega' in risultati:
+            lega = risultati['lega'].to_numpy()
+        return self.regola_colonne(risultati['id'].to_numpy(), risultati['gol_casa'].to_numpy(),
+                                   risultati['gol_trasferta'].to_numpy(), lega)
+
+    def riepilogo(self):
+        """
+        :return: dizionario con scommesse per stato, totale giocato, pagato e saldo delle scommesse chiuse
+        """
+        chiuse = self.stato != APERTA
+        giocato_chiuse = float(self.importo[chiuse].sum())
+        pagato = float(self.vincita.sum())
+        riepilogo = {etichetta: int(n) for etichetta, n in
+                     zip(ETICHETTE_STATO, np.bincount(self.stato, minlength=len(ETICHETTE_STATO)))}
+        riepilogo.update({
+            'giocato': float(self.importo.sum()),
+            'giocato_chiuse': giocato_chiuse,
+            'pagato': pagato,
+            'saldo_chiuse': giocato_chiuse - pagato,
+        })
+        return riepilogo
+
+    def in_dataframe(self, scommesse=None):
+        """
+        :param scommesse: indici delle scommesse da esportare (default: tutte)
+        :return: DataFrame con una riga per scommessa: eventi, quota totale, importo, stato e vincita
+        """
+        scommesse = np.arange(len(self)) if scommesse is None else np.asarray(scommesse)
+        return pd.DataFrame({
+            'scommessa': scommesse,
+            'eventi': self.eventi[scommesse],
+            'quota_totale': self.quota_totale[scommesse],
+            'importo': self.importo[scommesse],
+            'stato': pd.Categorical.from_codes(self.stato[scommesse], categories=list(ETICHETTE_STATO)),
+            'vincita': self.vincita[scommesse],
+        })
+
+
+# Esempio d'uso
+if __name__ == "__main__":
+    from datetime import datetime
+    import time
+
+    from cloude_virtual import GeneratoreQuoteCalcioVirtuale
+
+    generatore = GeneratoreQuoteCalcioVirtuale(margine_operatore=0.10, seed=11)
+    calendario = next(generatore.genera_stagione(ora_inizio=datetime(2025, 8, 23, 18)))
+    rng = np.random.default_rng(0)
+
+    # Un milione di scommesse: 70% singole, le altre multiple da 2 a 5 eventi distinti della giornata
+    num_scommesse = 1_000_000
+    eventi = np.where(rng.random(num_scommesse) < 0.7, 1, rng.integers(2, 6, num_scommesse))
+    scommessa = np.repeat(np.arange(num_scommesse), eventi)
+    posizione = np.arange(len(scommessa)) - np.repeat(np.cumsum(eventi) - eventi, eventi)
+    partite = np.argsort(rng.random((num_scommesse, len(calendario))), axis=1)[scommessa, posizione]
+    id_partita = calendario['id'].to_numpy()[partite]
+    mercato = rng.integers(0, 3, len(scommessa))
+    selezione = rng.integers(0, np.array([3, 2, 2])[mercato])
+    quota = quote_selezioni(calendario, id_partita, mercato, selezione, generatore.NUM_AZIONI_MAX)
+
+    regolamento = RegolamentoScommesse.per_generatore(generatore, scommessa, id_partita, mercato, selezione,
+                                                      quota, importo=np.full(num_scommesse, 1.0))
+    risultati = generatore.simula_giornata_completa(calendario)
+
+    inizio = time.perf_counter()
+    chiuse = regolamento.regola(risultati)
+    durata = time.perf_counter() - inizio
+
+    print(f"{len(chiuse):,} scommesse ({len(scommessa):,} selezioni) regolate in {durata * 1000:.0f} ms")
+    print(regolamento.riepilogo())
+    print(regolamento.in_dataframe(chiuse[:5]).to_string(index=False))
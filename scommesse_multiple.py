@@ -0,0 +1,216 @@
+import numpy as np
+
+from motore_quote import ETICHETTE_RISULTATO, righe_partite
+
+
+def polinomi_simmetrici(valori, grado_max=None):
+    """
+    Polinomi simmetrici elementari e_0 .. e_grado_max dei valori sull'ultimo asse.
+
+    e_k è la somma dei prodotti di tutte le combinazioni di k valori: si ottiene aggiungendo un valore
+    alla volta (e_k += v * e_(k-1)), con costo O(n * grado_max) invece di elencare le C(n, k)
+    combinazioni. Gli assi precedenti sono indipendenti, quindi un blocco di scommesse si calcola
+    nella stessa passata; un valore 0 equivale a un evento assente.
+
+    :param valori: array (..., n)
+    :param grado_max: grado massimo calcolato (default: n)
+    :return: array (..., grado_max + 1)
+    """
+    valori = np.asarray(valori, dtype=float)
+    num_valori = valori.shape[-1]
+    grado_max = num_valori if grado_max is None else min(grado_max, num_valori)
+
+    polinomi = np.zeros(valori.shape[:-1] + (grado_max + 1,))
+    polinomi[..., 0] = 1.0
+    for i in range(num_valori):
+        # Il membro destro è calcolato prima della somma, quindi usa ancora i gradi del passo precedente
+        polinomi[..., 1:] += valori[..., i:i + 1] * polinomi[..., :-1]
+    return polinomi
+
+
+def distribuzione_vincenti(probabilita):
+    """
+    Distribuzione del numero di eventi vinti tra eventi indipendenti (Poisson-binomiale)
+
+    :param probabilita: array (..., n) con la probabilità di vincita di ogni evento (0 = evento assente)
+    :return: array (..., n + 1) con la probabilità di vincerne esattamente 0 .. n
+    """
+    probabilita = np.asarray(probabilita, dtype=float)
+    distribuzione = np.zeros(probabilita.shape[:-1] + (probabilita.shape[-1] + 1,))
+    distribuzione[..., 0] = 1.0
+    for i in range(probabilita.shape[-1]):
+        p = probabilita[..., i:i + 1]
+        distribuzione[..., 1:] = distribuzione[..., 1:] * (1 - p) + distribuzione[..., :-1] * p
+        distribuzione[..., :1] *= 1 - p
+    return distribuzione
+
+
+def _eventi_validi(quote, probabilita):
+    # Gli eventi NaN riempiono le righe di un blocco di scommesse con meno eventi
+    quote = np.asarray(quote, dtype=float)
+    probabilita = np.asarray(probabilita, dtype=float)
+    validi = ~(np.isnan(quote) | np.isnan(probabilita))
+    return np.where(validi, quote, 0.0), np.where(validi, probabilita, 0.0), validi
+
+
+def prezzo_multipla(quote, probabilita, importo=1.0):
+    """
+    Quota, probabilità e margine di multiple (accumulatori): vincono solo se vincono tutti gli eventi
+
+    :param quote: array (..., n) con la quota di ogni evento (NaN = nessun evento)
+    :param probabilita: array (..., n) con la probabilità reale di ogni evento
+    :param importo: importo di ogni multipla
+    :return: dizionario con quota, probabilita, vincita_potenziale, vincita_attesa e margine
+             (quota dell'operatore sull'importo giocato)
+    """
+    quote, probabilita, validi = _eventi_validi(quote, probabilita)
+    quote = np.where(validi, quote, 1.0).prod(axis=-1)
+    probabilita = np.where(validi, probabilita, 1.0).prod(axis=-1)
+    return {
+        'quota': quote,
+        'probabilita': probabilita,
+        'vincita_potenziale': importo * quote,
+        'vincita_attesa': importo * quote * probabilita,
+        'margine': 1 - quote * probabilita,
+    }
+
+
+def prezzo_sistema(quote, probabilita, dimensioni, importo=1.0):
+    """
+    Prezzo di sistemi (es. 3 su 8): l'importo è diviso in parti uguali tra tutte le multiple di
+    ciascuna dimensione indicata e ogni multipla vince se vincono tutti i suoi eventi.
+
+    Gli eventi sono indipendenti (partite diverse), quindi la vincita massima di tutte le
+    combinazioni di k eventi è e_k(quote), la vincita attesa è e_k(quote * probabilità) e il loro
+    numero è e_k(1) = C(n, k): un sistema da 15 eventi richiede qualche centinaio di operazioni.
+
+    :param quote: array (..., n) con la quota di ogni evento (NaN = nessun evento)
+    :param probabilita: array (..., n) con la probabilità reale di ogni evento
+    :param dimensioni: dimensione delle multiple o sequenza di dimensioni (es. (2, 3) per un sistema 2-3 su n)
+    :param importo: importo totale di ogni sistema
+    :return: dizionario con combinazioni, importo_combinazione, vincita_massima, vincita_attesa,
+             probabilita_vincita (almeno una multipla vinta) e margine
+    """
+    quote, probabilita, validi = _eventi_validi(quote, probabilita)
+    dimensioni = np.atleast_1d(np.asarray(dimensioni, dtype=np.intp))
+    num_eventi = validi.sum(axis=-1)
+    if (dimensioni < 1).any() or (dimensioni[:, None] > np.ravel(num_eventi)).any():
+        raise ValueError("Le dimensioni del sistema devono essere tra 1 e il numero di eventi")
+
+    grado_max = int(dimensioni.max())
+    combinazioni = polinomi_simmetrici(validi, grado_max)[..., dimensioni].sum(axis=-1)
+    vincite = polinomi_simmetrici(quote, grado_max)[..., dimensioni].sum(axis=-1)
+    attese = polinomi_simmetrici(quote * probabilita, grado_max)[..., dimensioni].sum(axis=-1)
+    almeno = distribuzione_vincenti(probabilita)[..., dimensioni.min():].sum(axis=-1)
+
+    importo_combinazione = importo / combinazioni
+    return {
+        'combinazioni': combinazioni.astype(np.int64),
+        'importo_combinazione': importo_combinazione,
+        'vincita_massima': importo_combinazione * vincite,
+        'vincita_attesa': importo_combinazione * attese,
+        'probabilita_vincita': almeno,
+        'margine': 1 - attese / combinazioni,
+    }
+
+
+class PrezzatoreMultiple:
+    def __init__(self, calendario):
+        """
+        Prezzi di multiple e sistemi sull'esito 1X2 delle partite di un calendario.
+
+        Le probabilità reali sono le colonne probabilita_1/X/2 normalizzate a somma 1 (alcuni modelli
+        le scalano), le quote sono quelle offerte nel calendario.
+
+        :param calendario: DataFrame prodotto dal generatore (colonne id, quota_1/X/2 e probabilita_1/X/2)
+        """
+        self.ids_partite = calendario['id'].to_numpy()
+        self.quote = calendario[['quota_1', 'quota_X', 'quota_2']].to_numpy(dtype=float)
+        probabilita = calendario[['probabilita_1', 'probabilita_X', 'probabilita_2']].to_numpy(dtype=float)
+        self.probabilita = probabilita / probabilita.sum(axis=1, keepdims=True)
+
+    def selezioni(self, id_partita, esito):
+        """
+        Quote e probabilità di un insieme di selezioni 1X2
+
+        :param id_partita: array (..., n) di id delle partite
+        :param esito: array (..., n) di esiti, come etichette ('1', 'X', '2') o codici (0, 1, 2);
+                      -1 o None indicano un evento vuoto in un blocco di scommesse
+        :return: tuple (quote, probabilita) di array (..., n), NaN per gli eventi vuoti
+        """
+        id_partita = np.asarray(id_partita)
+        esito = np.asarray(esito)
+        if esito.dtype == object or esito.dtype.kind == 'U':
+            codici = np.full(esito.shape, -1, dtype=np.intp)
+            for codice, etichetta in enumerate(ETICHETTE_RISULTATO):
+                codici[esito == etichetta] = codice
+            if ((codici < 0) & (esito != None)).any():  # noqa: E711
+                raise ValueError("Esiti 1X2 sconosciuti")
+            esito = codici
+        esito = esito.astype(np.intp)
+
+        validi = esito >= 0
+        righe, trovate = righe_partite(self.ids_partite, id_partita.ravel())
+        righe = righe.reshape(id_partita.shape)
+        if not trovate.reshape(id_partita.shape)[validi].all():
+            raise KeyError("Partite non presenti nel calendario")
+        if id_partita.ndim > 1 or validi.sum() > 1:
+            # Due esiti della stessa partita non sono indipendenti e non possono stare nella stessa multipla
+            ordinati = np.sort(np.where(validi, id_partita, -1 - np.arange(id_partita.shape[-1])), axis=-1)
+            if (ordinati[..., 1:] == ordinati[..., :-1]).any():
+                raise ValueError("Una multipla non può contenere due selezioni della stessa partita")
+
+        esito = np.where(validi, esito, 0)
+        quote = np.where(validi, self.quote[righe, esito], np.nan)
+        probabilita = np.where(validi, self.probabilita[righe, esito], np.nan)
+        return quote, probabilita
+
+    def multipla(self, id_partita, esito, importo=1.0):
+        """
+        :return: prezzo_multipla delle selezioni indicate (vedi selezioni)
+        """
+        return prezzo_multipla(*self.selezioni(id_partita, esito), importo)
+
+    def sistema(self, id_partita, esito, dimensioni, importo=1.0):
+        """
+        :return: prezzo_sistema delle selezioni indicate (vedi selezioni)
+        """
+        return prezzo_sistema(*self.selezioni(id_partita, esito), dimensioni, importo)
+
+
+# Esempio d'uso
+if __name__ == "__main__":
+    from datetime import datetime
+    from itertools import combinations
+    import time
+
+    from cloude_v3 import GeneratoreQuoteCalcioVirtuale
+
+    generatore = GeneratoreQuoteCalcioVirtuale(margine_operatore=0.10, seed=5)
+    calendario = generatore.genera_calendario_virtuale()
+    prezzatore = PrezzatoreMultiple(calendario)
+    rng = np.random.default_rng(0)
+
+    # Sistema 3 su 8 confrontato con l'enumerazione di tutte le combinazioni
+    ids = calendario['id'].to_numpy()[:8]
+    esiti = ETICHETTE_RISULTATO[rng.integers(0, 3, 8)]
+    sistema = prezzatore.sistema(ids, esiti, 3, importo=56.0)
+    quote, probabilita = prezzatore.selezioni(ids, esiti)
+    enumerato = sum(np.prod(quote[list(c)]) for c in combinations(range(8), 3))
+    print(f"Sistema 3 su 8: {sistema['combinazioni']} multiple da {sistema['importo_combinazione']:.2f}, "
+          f"vincita massima {sistema['vincita_massima']:.2f} (enumerazione: {enumerato:.2f}), "
+          f"probabilità di vincita {sistema['probabilita_vincita']:.3f}, margine {sistema['margine']:.3f}")
+
+    multipla = prezzatore.multipla(ids[:4], esiti[:4], importo=10.0)
+    print(f"Multipla da 4: quota {multipla['quota']:.2f}, probabilità {multipla['probabilita']:.4f}, "
+          f"margine {multipla['margine']:.3f}")
+
+    # Sistema integrale 2-15 su 15 eventi (32.752 multiple) per un blocco di 10.000 scommesse
+    num_scommesse = 10_000
+    ids_blocco = np.array([rng.choice(calendario['id'].to_numpy(), 15, replace=False) for _ in range(num_scommesse)])
+    esiti_blocco = rng.integers(0, 3, (num_scommesse, 15))
+    inizio = time.perf_counter()
+    blocco = prezzatore.sistema(ids_blocco, esiti_blocco, range(2, 16), importo=100.0)
+    durata = time.perf_counter() - inizio
+    print(f"{num_scommesse:,} sistemi 2-15 su 15 ({blocco['combinazioni'][0]:,} multiple ciascuno) "
+          f"in {durata * 1000:.0f} ms, margine medio {blocco['margine'].mean():.3f}")
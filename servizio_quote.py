@@ -0,0 +1,260 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from motore_quote import quote_mercati_gol, quote_risultati_esatti_in_dizionari, quote_under_over_in_dizionari
+
+# Mercati che il servizio sa quotare
+MERCATI = ('1x2', 'under_over', 'goal_nogoal', 'risultato_esatto')
+
+# Numero massimo di richieste quotate insieme e attesa massima per completare un batch
+DIMENSIONE_BATCH_MAX = 256
+ATTESA_BATCH = 0.002
+
+
+def _rifiuta_costante(costante):
+    raise ValueError(f"Valore non ammesso nella richiesta: {costante}")
+
+
+class ServizioQuote:
+    def __init__(self, generatore, dimensione_batch_max=DIMENSIONE_BATCH_MAX, attesa_batch=ATTESA_BATCH,
+                 executor=None):
+        """
+        Servizio asyncio che quota partite su richiesta, raggruppando le richieste concorrenti
+        in chiamate vettoriali al generatore.
+
+        Il protocollo è JSON su righe: ogni richiesta è un oggetto
+        {"id": ..., "casa": id o nome, "trasferta": id o nome, "mercati": ["1x2", ...]}
+        e riceve una risposta con lo stesso "id" e le quote per mercato, oppure "errore".
+
+        :param generatore: GeneratoreQuoteCalcioVirtuale (cloude_v3 o cloude_virtual)
+        :param dimensione_batch_max: numero massimo di richieste quotate in un'unica chiamata
+        :param attesa_batch: secondi di attesa massima per raccogliere altre richieste nel batch
+        :param executor: executor per i risultati esatti (default: un ThreadPoolExecutor dedicato)
+        """
+        self.generatore = generatore
+        self.dimensione_batch_max = dimensione_batch_max
+        self.attesa_batch = attesa_batch
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+        self._ids_per_nome = {nome: i for i, nome in enumerate(generatore.squadre.nomi)}
+        self._coda = None
+        self._ciclo = None
+        self._server = None
+        # Batch in attesa dei risultati esatti dall'executor
+        self._in_corso = set()
+
+    def _id_squadra(self, squadra):
+        if isinstance(squadra, str):
+            if squadra not in self._ids_per_nome:
+                raise ValueError(f"Squadra sconosciuta: '{squadra}'")
+            return self._ids_per_nome[squadra]
+        if not 0 <= squadra < len(self.generatore.squadre):
+            raise ValueError(f"Id squadra fuori intervallo: {squadra}")
+        return int(squadra)
+
+    async def quota(self, casa, trasferta, mercati=('1x2',)):
+        """
+        Quota una partita passando dal batch corrente
+
+        :param casa: id o nome della squadra di casa
+        :param trasferta: id o nome della squadra in trasferta
+        :param mercati: mercati richiesti, tra quelli in MERCATI
+        :return: dizionario {mercato: quote}
+        """
+        mercati = tuple(mercati)
+        sconosciuti = set(mercati) - set(MERCATI)
+        if sconosciuti:
+            raise ValueError(f"Mercati sconosciuti: {sorted(sconosciuti)}")
+        id_casa, id_trasferta = self._id_squadra(casa), self._id_squadra(trasferta)
+        if id_casa == id_trasferta:
+            raise ValueError("Una squadra non può giocare contro se stessa")
+
+        if self._ciclo is None:
+            self._coda = asyncio.Queue()
+            self._ciclo = asyncio.create_task(self._ciclo_batch())
+
+        risposta = asyncio.get_running_loop().create_future()
+        await self._coda.put((id_casa, id_trasferta, mercati, risposta))
+        return await risposta
+
+    async def _ciclo_batch(self):
+        while True:
+            batch = [await self._coda.get()]
+            scadenza = asyncio.get_running_loop().time() + self.attesa_batch
+            while len(batch) < self.dimensione_batch_max:
+                if self._coda.empty():
+                    attesa = scadenza - asyncio.get_running_loop().time()
+                    if attesa <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._coda.get(), attesa))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self._coda.get_nowait())
+            self._quota_batch(batch)
+
+    def _quota_batch(self, batch):
+        """
+        Quota un batch di richieste: 1X2 in forma vettoriale nel ciclo degli eventi,
+        mercati sui gol (Under/Over, Goal/NoGoal, risultato esatto) nell'executor
+        """
+        quote = [{} for _ in batch]
+        per_mercato = {m: [i for i, richiesta in enumerate(batch) if m in richiesta[2]] for m in MERCATI}
+
+        if per_mercato['1x2']:
+            indici = per_mercato['1x2']
+            try:
+                probabilita = self.generatore.calcola_probabilita_risultati_batch(
+                    [batch[i][0] for i in indici], [batch[i][1] for i in indici])
+            except Exception as errore:
+                self._fallisci(batch, errore)
+                return
+            for i, riga in zip(indici, self.generatore.calcola_quote_1x2_batch(probabilita).tolist()):
+                quote[i]['1x2'] = dict(zip(('1', 'X', '2'), riga))
+
+        # Mercati sui gol: una sola griglia del risultato esatto per partita, calcolata nell'executor
+        # così le altre richieste continuano a essere servite
+        for mercato in ('under_over', 'goal_nogoal'):
+            if mercato not in self.generatore.modello.MERCATI:
+                for i in per_mercato[mercato]:
+                    batch[i][3].set_exception(ValueError(f"Mercato {mercato} non supportato dal modello"))
+        indici = [i for i, richiesta in enumerate(batch) if not richiesta[3].done()
+                  and any(m in richiesta[2] for m in ('under_over', 'goal_nogoal', 'risultato_esatto'))]
+        if indici:
+            task = asyncio.create_task(self._completa_mercati_gol(batch, quote, indici))
+            self._in_corso.add(task)
+            task.add_done_callback(self._in_corso.discard)
+        else:
+            self._rispondi(batch, quote)
+
+    async def _completa_mercati_gol(self, batch, quote, indici):
+        ids_casa = np.array([batch[i][0] for i in indici])
+        ids_trasferta = np.array([batch[i][1] for i in indici])
+        try:
+            probabilita, griglie = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.generatore.calcola_quote_risultato_esatto_batch, ids_casa, ids_trasferta)
+        except Exception as errore:
+            self._fallisci(batch, errore)
+            return
+
+        quote_under_over, quote_goal_nogoal = quote_mercati_gol(probabilita, self.generatore.margine_operatore)
+        risultati_esatti = quote_risultati_esatti_in_dizionari(griglie, self.generatore.NUM_AZIONI_MAX)
+        under_over = quote_under_over_in_dizionari(quote_under_over)
+        for posizione, i in enumerate(indici):
+            mercati = batch[i][2]
+            if 'under_over' in mercati:
+                quote[i]['under_over'] = under_over[posizione]
+            if 'goal_nogoal' in mercati:
+                quota_nogoal, quota_goal = quote_goal_nogoal[posizione].tolist()
+                quote[i]['goal_nogoal'] = {'Goal': quota_goal, 'NoGoal': quota_nogoal}
+            if 'risultato_esatto' in mercati:
+                quote[i]['risultato_esatto'] = risultati_esatti[posizione]
+        self._rispondi(batch, quote)
+
+    @staticmethod
+    def _fallisci(batch, errore):
+        for *_, risposta in batch:
+            if not risposta.done():
+                risposta.set_exception(errore)
+
+    @staticmethod
+    def _rispondi(batch, quote):
+        for (*_, risposta), quote_partita in zip(batch, quote):
+            if not risposta.done():
+                risposta.set_result(quote_partita)
+
+    async def _gestisci_connessione(self, reader, writer):
+        in_corso = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self._rispondi_riga(line, writer))
+                in_corso.add(task)
+                task.add_done_callback(in_corso.discard)
+            if in_corso:
+                await asyncio.gather(*in_corso)
+        finally:
+            writer.close()
+
+    async def _rispondi_riga(self, line, writer):
+        # Ogni riga riceve esattamente una risposta, anche se il generatore o l'executor falliscono
+        id_richiesta = None
+        try:
+            richiesta = json.loads(line, parse_constant=_rifiuta_costante)
+            id_richiesta = richiesta.get('id')
+            quote = await self.quota(richiesta['casa'], richiesta['trasferta'], richiesta.get('mercati', ('1x2',)))
+            # NaN e infiniti non sono JSON valido per i client rigorosi
+            testo = json.dumps({'id': id_richiesta, 'quote': quote}, allow_nan=False)
+        except Exception as errore:
+            testo = json.dumps({'id': id_richiesta, 'errore': f"{type(errore).__name__}: {errore}"})
+        writer.write(testo.encode() + b'\n')
+        await writer.drain()
+
+    async def avvia(self, host='127.0.0.1', porta=0):
+        """
+        Avvia il server TCP locale
+
+        :param host: indirizzo di ascolto (default: solo connessioni locali)
+        :param porta: porta di ascolto (0 = scelta dal sistema)
+        :return: porta effettivamente in ascolto
+        """
+        self._server = await asyncio.start_server(self._gestisci_connessione, host, porta)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def chiudi(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._ciclo is not None:
+            self._ciclo.cancel()
+            self._ciclo = None
+        self.executor.shutdown(wait=False)
+
+
+async def richiedi_quote(host, porta, richieste):
+    """
+    Client di prova: invia le richieste su una sola connessione e attende tutte le risposte
+
+    :param host: indirizzo del servizio
+    :param porta: porta del servizio
+    :param richieste: lista di dizionari richiesta (ciascuno con un 'id' univoco)
+    :return: dizionario {id: risposta}
+    """
+    reader, writer = await asyncio.open_connection(host, porta)
+    try:
+        for richiesta in richieste:
+            writer.write(json.dumps(richiesta).encode() + b'\n')
+        await writer.drain()
+        risposte = {}
+        while len(risposte) < len(richieste):
+            risposta = json.loads(await reader.readline())
+            risposte[risposta['id']] = risposta
+        return risposte
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+# Esempio d'uso
+if __name__ == "__main__":
+    from cloude_virtual import GeneratoreQuoteCalcioVirtuale
+
+    async def esempio():
+        servizio = ServizioQuote(GeneratoreQuoteCalcioVirtuale(margine_operatore=0.10))
+        porta = await servizio.avvia()
+        try:
+            nomi = servizio.generatore.squadre.nomi
+            richieste = [{'id': i, 'casa': nomi[i % len(nomi)], 'trasferta': int((i + 1) % len(nomi)),
+                          'mercati': list(MERCATI) if i % 10 == 0 else ['1x2']} for i in range(100)]
+            richieste.append({'id': 'errata', 'casa': 'Squadra inesistente', 'trasferta': 0})
+            risposte = await richiedi_quote('127.0.0.1', porta, richieste)
+            print(f"{len(risposte)} risposte dalla porta {porta}")
+            print(json.dumps(risposte[0]['quote']['1x2']))
+            print(json.dumps(risposte[0]['quote']['under_over']), len(risposte[0]['quote']['risultato_esatto']))
+            print(risposte['errata'])
+        finally:
+            await servizio.chiudi()
+
+    asyncio.run(esempio())
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+from motore_quote import (ETICHETTE_GOAL_NOGOAL, ETICHETTE_RISULTATO, ETICHETTE_UNDER_OVER, codici_esiti,
+                          etichette_risultati_esatti)
+
+# Tipo di ogni colonna dello storico
+COLONNE = {
+    'id': np.int64,
+    'data_ora': 'datetime64[s]',
+    'id_casa': np.int16,
+    'id_trasferta': np.int16,
+    'gol_casa': np.int8,
+    'gol_trasferta': np.int8,
+    'risultato': np.int8,
+    'under_over': np.int8,
+    'goal_nogoal': np.int8,
+    'risultato_esatto': np.int16,
+}
+
+# Colonne memorizzate come codici, con le etichette corrispondenti
+COLONNE_CATEGORICHE = ('risultato', 'under_over', 'goal_nogoal', 'risultato_esatto')
+
+
+def etichette_esiti(max_gol):
+    """
+    :param max_gol: numero massimo di gol quotato nel risultato esatto
+    :return: dizionario {colonna categorica: array delle etichette indicizzato dal codice}
+    """
+    return {
+        'risultato': ETICHETTE_RISULTATO,
+        'under_over': ETICHETTE_UNDER_OVER,
+        'goal_nogoal': ETICHETTE_GOAL_NOGOAL,
+        'risultato_esatto': etichette_risultati_esatti(max_gol),
+    }
+
+
+class StoricoRisultati:
+    def __init__(self, max_gol=6, limite_per_squadra=False, capacita_iniziale=1 << 16):
+        """
+        Storico colonnare dei risultati: ogni giornata regolata viene accodata in colonne
+        NumPy tipizzate e preallocate (gol int8, esiti come codici int8/int16), senza colonne object.
+        La capacità raddoppia quando serve, quindi l'accodamento costa O(1) ammortizzato.
+
+        :param max_gol: numero massimo di gol quotato nel risultato esatto (NUM_AZIONI_MAX del generatore)
+        :param limite_per_squadra: come in esiti_partite (True per cloude_virtual, False per cloude_v3)
+        :param capacita_iniziale: numero di partite preallocate
+        """
+        self.max_gol = max_gol
+        self.limite_per_squadra = limite_per_squadra
+        self._colonne = {nome: np.empty(capacita_iniziale, dtype=tipo) for nome, tipo in COLONNE.items()}
+        self._lunghezza = 0
+
+    @property
+    def etichette(self):
+        return etichette_esiti(self.max_gol)
+
+    def __len__(self):
+        return self._lunghezza
+
+    @property
+    def capacita(self):
+        return len(self._colonne['id'])
+
+    def _riserva(self, num_partite):
+        necessaria = self._lunghezza + num_partite
+        if necessaria <= self.capacita:
+            return
+        capacita = max(necessaria, 2 * self.capacita)
+        for nome, colonna in self._colonne.items():
+            nuova = np.empty(capacita, dtype=colonna.dtype)
+            nuova[:self._lunghezza] = colonna[:self._lunghezza]
+            self._colonne[nome] = nuova
+
+    def aggiungi(self, ids, data_ora, ids_casa, ids_trasferta, gol_casa, gol_trasferta):
+        """
+        Accoda le partite di una giornata regolata, calcolando gli esiti dai gol
+
+        :param ids: array con gli id delle partite
+        :param data_ora: array di orari (datetime64 o convertibile)
+        :param ids_casa: array di indici delle squadre di casa
+        :param ids_trasferta: array di indici delle squadre in trasferta
+        :param gol_casa: array con i gol della squadra di casa
+        :param gol_trasferta: array con i gol della squadra in trasferta
+        :return: slice delle righe aggiunte
+        """
+        gol_casa = np.asarray(gol_casa)
+        gol_trasferta = np.asarray(gol_trasferta)
+        num_partite = len(gol_casa)
+        self._riserva(num_partite)
+
+        righe = slice(self._lunghezza, self._lunghezza + num_partite)
+        valori = {
+            'id': ids,
+            'data_ora': np.asarray(data_ora, dtype='datetime64[s]'),
+            'id_casa': ids_casa,
+            'id_trasferta': ids_trasferta,
+            'gol_casa': gol_casa,
+            'gol_trasferta': gol_trasferta,
+            **codici_esiti(gol_casa, gol_trasferta, self.max_gol, self.limite_per_squadra),
+        }
+        for nome, valore in valori.items():
+            self._colonne[nome][righe] = valore
+
+        self._lunghezza += num_partite
+        return righe
+
+    def aggiungi_giornata(self, risultati):
+        """
+        Accoda il DataFrame prodotto da simula_giornata_completa (vengono lette solo le colonne numeriche)
+
+        :param risultati: DataFrame con id, data_ora, id_casa, id_trasferta, gol_casa, gol_trasferta
+        :return: slice delle righe aggiunte
+        """
+        return self.aggiungi(risultati['id'].to_numpy(), risultati['data_ora'].to_numpy(),
+                             risultati['id_casa'].to_numpy(), risultati['id_trasferta'].to_numpy(),
+                             risultati['gol_casa'].to_numpy(), risultati['gol_trasferta'].to_numpy())
+
+    def __getitem__(self, colonna):
+        """
+        Restituisce una colonna come vista in sola lettura (nessuna copia) sulle partite accodate
+
+        :param colonna: nome della colonna, tra quelle in COLONNE
+        :return: array di lunghezza len(self)
+        """
+        vista = self._colonne[colonna][:self._lunghezza]
+        vista.flags.writeable = False
+        return vista
+
+    def viste(self, righe=slice(None)):
+        """
+        :param righe: slice o maschera booleana delle partite (le slice non copiano i dati)
+        :return: dizionario {colonna: array}
+        """
+        return {nome: self[nome][righe] for nome in COLONNE}
+
+    def in_dataframe(self, righe=slice(None)):
+        """
+        Esporta le partite in un DataFrame con colonne Categorical costruite dai codici
+
+        :param righe: slice o maschera booleana delle partite da esportare
+        :return: DataFrame
+        """
+        colonne = self.viste(righe)
+        for nome, etichette in self.etichette.items():
+            colonne[nome] = pd.Categorical.from_codes(colonne[nome], categories=list(etichette))
+        return pd.DataFrame(colonne)
+
+    def memoria(self):
+        """
+        :return: byte occupati dalle colonne, compresa la capacità preallocata non ancora usata
+        """
+        return sum(colonna.nbytes for colonna in self._colonne.values())
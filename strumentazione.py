@@ -0,0 +1,120 @@
+from time import perf_counter
+
+
+class _MisuraNulla:
+    """
+    Context manager vuoto condiviso da tutte le misure disattivate
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *eccezione):
+        return False
+
+
+_MISURA_NULLA = _MisuraNulla()
+
+
+class _Misura:
+    __slots__ = ('_sink', '_nome', '_inizio')
+
+    def __init__(self, sink, nome):
+        self._sink = sink
+        self._nome = nome
+
+    def __enter__(self):
+        self._inizio = perf_counter()
+        return self
+
+    def __exit__(self, *eccezione):
+        self._sink.registra_tempo(self._nome, perf_counter() - self._inizio)
+        return False
+
+
+class StrumentazioneDisattiva:
+    """
+    Strumentazione predefinita: timer e contatori non fanno nulla, così il percorso
+    di quotazione paga solo una chiamata di metodo per punto di misura
+    """
+    attiva = False
+
+    def misura(self, nome):
+        return _MISURA_NULLA
+
+    def conta(self, nome, valore=1):
+        pass
+
+
+NESSUNA_STRUMENTAZIONE = StrumentazioneDisattiva()
+
+
+class Strumentazione:
+    def __init__(self, sink):
+        """
+        Inoltra tempi e conteggi dei punti di misura a un sink di metriche
+
+        :param sink: oggetto con i metodi registra_tempo(nome, secondi) e registra_conteggio(nome, valore)
+        """
+        self.sink = sink
+        self.attiva = True
+
+    def misura(self, nome):
+        """
+        Cronometra il blocco with e registra la durata sotto il nome indicato
+
+        :param nome: nome del punto di misura (es. 'calendario.quote_1x2')
+        """
+        return _Misura(self.sink, nome)
+
+    def conta(self, nome, valore=1):
+        """
+        Incrementa un contatore (es. numero di partite quotate)
+
+        :param nome: nome del contatore
+        :param valore: incremento
+        """
+        self.sink.registra_conteggio(nome, valore)
+
+
+class MetricheInMemoria:
+    def __init__(self):
+        """
+        Sink di metriche che aggrega in memoria numero di misure, tempo totale e tempo massimo
+        """
+        self.tempi = {}
+        self.conteggi = {}
+
+    def registra_tempo(self, nome, secondi):
+        statistiche = self.tempi.get(nome)
+        if statistiche is None:
+            self.tempi[nome] = [1, secondi, secondi]
+        else:
+            statistiche[0] += 1
+            statistiche[1] += secondi
+            if secondi > statistiche[2]:
+                statistiche[2] = secondi
+
+    def registra_conteggio(self, nome, valore):
+        self.conteggi[nome] = self.conteggi.get(nome, 0) + valore
+
+    def riepilogo(self):
+        """
+        :return: dizionario {nome: {'chiamate', 'totale_ms', 'medio_ms', 'massimo_ms'}} più i contatori
+        """
+        riepilogo = {
+            nome: {
+                'chiamate': chiamate,
+                'totale_ms': totale * 1000,
+                'medio_ms': totale / chiamate * 1000,
+                'massimo_ms': massimo * 1000,
+            }
+            for nome, (chiamate, totale, massimo) in self.tempi.items()
+        }
+        riepilogo['contatori'] = dict(self.conteggi)
+        return riepilogo
+
+    def azzera(self):
+        self.tempi.clear()
+        self.conteggi.clear()
@@ -0,0 +1,41 @@
+import numpy as np
+
+from cloude_virtual import GeneratoreQuoteCalcioVirtuale
+
+
+def _generatori_con_squadra_modificata():
+    # Due generatori identici con la stessa modifica: il secondo ricostruisce la tabella da capo
+    generatori = [GeneratoreQuoteCalcioVirtuale(seed=3) for _ in range(2)]
+    for generatore in generatori:
+        generatore.squadre.aggiorna(0, attacco=10, difesa=10, forma=60)
+    generatori[1]._costruisci_tabella_coppie()
+    return generatori
+
+
+def test_1x2_dopo_modifica_del_registro():
+    generatore, riferimento = _generatori_con_squadra_modificata()
+    ids_casa, ids_trasferta = np.array([0, 1, 2]), np.array([1, 0, 3])
+
+    np.testing.assert_allclose(generatore.calcola_probabilita_risultati_batch(ids_casa, ids_trasferta),
+                               riferimento.calcola_probabilita_risultati_batch(ids_casa, ids_trasferta))
+    assert generatore.calcola_probabilita_risultati(0, 1) == riferimento.calcola_probabilita_risultati(0, 1)
+
+
+def test_riquota_partite_aperte_dopo_modifica_del_registro():
+    generatore = GeneratoreQuoteCalcioVirtuale(seed=3)
+    calendario = next(generatore.genera_stagione())
+    generatore.apri_calendario(calendario)
+    generatore.squadre.aggiorna(0, attacco=10, difesa=10, forma=60)
+
+    riquotate = generatore.riquota_partite_aperte()
+
+    della_squadra = (calendario['id_casa'] == 0) | (calendario['id_trasferta'] == 0)
+    assert set(riquotate['id']) == set(calendario.loc[della_squadra, 'id'])
+    # Probabilità 1X2 entro la variazione casuale del modello attorno a quelle calcolate da capo
+    ids_casa, ids_trasferta = riquotate['id_casa'].to_numpy(), riquotate['id_trasferta'].to_numpy()
+    base = generatore.modello.probabilita_base(generatore.squadre, ids_casa, ids_trasferta)
+    base = base / base.sum(axis=1, keepdims=True) * generatore.modello.SCALA_1X2
+    probabilita = riquotate[['probabilita_1', 'probabilita_X', 'probabilita_2']].to_numpy()
+    variazione = generatore.modello.VARIAZIONE_1X2
+    limite = (1 + variazione) / (1 - variazione)
+    assert ((probabilita / base < limite) & (base / probabilita < limite)).all()
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+from regolamento_scommesse import PERSA, VINTA, RegolamentoScommesse
+
+
+def test_regola_feed_con_leghe_senza_scommesse():
+    # Feed di tre leghe che riusano gli stessi id, come quello di GestoreLeghe
+    risultati = pd.DataFrame({
+        'lega': ['L0', 'L0', 'L1', 'L1', 'L2', 'L2'],
+        'id': [1, 2, 1, 2, 1, 2],
+        'gol_casa': [2, 0, 0, 3, 1, 1],
+        'gol_trasferta': [1, 0, 2, 0, 1, 4],
+    })
+    # Due singole sull'1X2 della sola lega L0: '1' sulla partita 1 e '2' sulla partita 2
+    regolamento = RegolamentoScommesse(scommessa=[0, 1], id_partita=[1, 2], mercato=[0, 0], selezione=[0, 2],
+                                       quota=[2.0, 3.0], importo=[10.0, 10.0], lega=['L0', 'L0'])
+
+    chiuse = regolamento.regola(risultati)
+
+    np.testing.assert_array_equal(chiuse, [0, 1])
+    np.testing.assert_array_equal(regolamento.stato, [VINTA, PERSA])
+    np.testing.assert_allclose(regolamento.vincita, [20.0, 0.0])